@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ------------------------------------------------------------------------------
+# Generator benchmarks
+#
+# Each case runs in a fresh interpreter (this file with "_generator <json>") so
+# peak RSS belongs to that case alone. Results are rows/sec over all sheets.
+# ------------------------------------------------------------------------------
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _run_generator_case(case):
+    sys.path.insert(0, HERE)
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "out.xlsx" if case["format"] == "xlsx" else "out")
+        if case["script"] == "demo":
+            import demo
+            rows = int(round(case["duration"] * demo.rate))
+            t0 = time.perf_counter()
+            demo.generate(output, case["format"], duration=case["duration"])
+        else:
+            import demografana
+            params = {
+                "ldr_duration": case["duration"],
+                "thruster_duration": case["duration"],
+                "tank_duration": case["duration"],
+                "ldr_channels": case["channels"],
+                "thrusters": case["thrusters"],
+            }
+            rows = sum(s["num_points"] for s in demografana.generate_sheets(0, **params))
+            t0 = time.perf_counter()
+            demografana.generate(output, case["format"], seed=0, workers=case["workers"], **params)
+        elapsed = time.perf_counter() - t0
+    return {**case, "rows": rows, "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed else None,
+            "peak_rss_bytes": peak_rss_bytes()}
+
+def generator_cases(args):
+    for fmt in args.formats:
+        for duration in args.durations:
+            yield {"script": "demo", "format": fmt, "duration": duration}
+            for channels in args.channels:
+                for thrusters in args.thrusters:
+                    yield {"script": "demografana", "format": fmt, "duration": duration,
+                           "channels": channels, "thrusters": thrusters, "workers": args.workers}
+
+def bench_generators(args):
+    results = []
+    for case in generator_cases(args):
+        proc = subprocess.run([sys.executable, __file__, "_generator", json.dumps(case)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            result = {**case, "error": proc.stderr.strip().splitlines()[-1:]}
+        else:
+            result = json.loads(proc.stdout)
+        print(f"  {result}")
+        results.append(result)
+    return results
+
+# ------------------------------------------------------------------------------
+# Executor benchmarks
+#
+# SequenceEngine.execute_block runs with the engine module's clock and command
+# sender replaced by virtual ones, so sleeps cost nothing. Wall time is then
+# pure scheduling/interpretation overhead, and the virtual elapsed time
+# compared with the nominal sequence duration is the timing error. Step counts
+# and nominal durations come from dry_run.estimate, so only commands and delays
+# count as executed steps (loop bookkeeping is overhead, not a step).
+# ------------------------------------------------------------------------------
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, secs):
+        self.now += max(0.0, secs)
+
+    def monotonic(self):
+        return self.now
+
+    time = perf_counter = monotonic
+
+    def sender(self, secs):
+        # Async per-node send taking `secs` of virtual time. Concurrent sends
+        # all start at the same virtual instant, so a fan-out costs max, not sum.
+        async def send(command, node):
+            deadline = self.now + secs
+            await asyncio.sleep(0)
+            self.now = max(self.now, deadline)
+            return "ok"
+        return send
+
+# Fixed cost of one command step in the executor (its dummy per-node send)
+COMMAND_SECONDS = 1.0
+
+def synthetic_sequence(depth, loop_count, steps):
+    # `steps` commands/delays per level, each level wrapped in a loop around the next
+    node = {"name": "Node1", "scid": 5, "com": "COM3"}
+    block = []
+    for level in reversed(range(depth + 1)):
+        body = []
+        for s in range(steps):
+            if s % 2:
+                body.append({"type": "delay", "seconds": 1})
+            else:
+                body.append({"type": "command", "command": "idle", "nodes": [node]})
+        if block:
+            body.append({"type": "loop", "count": loop_count, "tasks": block})
+        block = body
+    return block
+
+def sequence_totals(block):
+    # (executed command/delay steps, nominal seconds) with loops expanded
+    from dry_run import estimate
+    from sequence_plan import compile_sequence
+    totals = estimate(compile_sequence(block), command_slot=COMMAND_SECONDS)
+    return totals["steps"], totals["seconds"]
+
+def headless_engine():
+    sys.path.insert(0, HERE)
+    import sequence_engine
+    return sequence_engine, sequence_engine.SequenceEngine(log=lambda msg: None)
+
+def bench_executor(args):
+    engine_module, engine = headless_engine()
+    real_time = engine_module.time
+    results = []
+    try:
+        for depth in args.depths:
+            for steps in args.steps:
+                sequence = synthetic_sequence(depth, args.loop_count, steps)
+                total_steps, nominal = sequence_totals(sequence)
+                clock = VirtualClock()
+                engine_module.time = clock
+                engine.send_command = clock.sender(COMMAND_SECONDS)
+                t0 = time.perf_counter()
+                engine.execute_block(sequence)
+                wall = time.perf_counter() - t0
+                engine_module.time = real_time
+                result = {
+                    "depth": depth, "loop_count": args.loop_count, "steps_per_level": steps,
+                    "executed_steps": total_steps, "wall_seconds": wall,
+                    "overhead_us_per_step": wall / total_steps * 1e6,
+                    "nominal_seconds": nominal, "virtual_seconds": clock.now,
+                    "timing_error_seconds": clock.now - nominal,
+                }
+                print(f"  {result}")
+                results.append(result)
+    finally:
+        engine_module.time = real_time
+    return results
+
+# ------------------------------------------------------------------------------
+# Main
+# ------------------------------------------------------------------------------
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the telemetry generators and sequence executor.")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--skip-generators", action="store_true")
+    parser.add_argument("--skip-executor", action="store_true")
+
+    gen = parser.add_argument_group("generators")
+    gen.add_argument("--formats", nargs="+", default=["xlsx", "csv"])
+    gen.add_argument("--durations", type=float, nargs="+", default=[600, 6000, 60000])
+    gen.add_argument("--channels", type=int, nargs="+", default=[8, 64], help="LDR channel counts")
+    gen.add_argument("--thrusters", type=int, nargs="+", default=[4, 16])
+    gen.add_argument("--workers", type=int, default=0)
+
+    ex = parser.add_argument_group("executor")
+    ex.add_argument("--depths", type=int, nargs="+", default=[1, 4, 8])
+    ex.add_argument("--steps", type=int, nargs="+", default=[10, 100, 1000])
+    ex.add_argument("--loop-count", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    if not args.skip_generators:
+        print("Generators:")
+        report["generators"] = bench_generators(args)
+    if not args.skip_executor:
+        print("Executor:")
+        report["executor"] = bench_executor(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote benchmark results to {args.output}")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "_generator":
+        print(json.dumps(_run_generator_case(json.loads(sys.argv[2]))))
+    else:
+        main()
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import time
+
+from sequence_plan import check_position
+
+# ------------------------------------------------------------------------------
+# Run checkpoints
+#
+# The executor's whole position in a compiled plan is a cursor: the pc of the
+# next step to run plus the stack of iteration counters of the loops it is in
+# (outermost first). After each completed timed step the cursor is updated in
+# memory, and written to disk at most every `interval` seconds and whenever
+# the run stops. Writes go to a temp file that is fsynced and then os.replace()d
+# over the checkpoint, so a crash mid-write leaves the previous checkpoint
+# intact. At worst a resumed run repeats the steps of the last interval.
+#
+# The checkpoint records a fingerprint of the plan, so it can only be resumed
+# against the same sequence, including after restarting the app.
+# ------------------------------------------------------------------------------
+CHECKPOINT_FILE = "test_suite.checkpoint.json"
+CHECKPOINT_INTERVAL = 1.0  # seconds between checkpoint writes during a run
+VERSION = 1
+
+def plan_fingerprint(plan):
+    data = json.dumps([plan.ops, plan.args], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    # Returns the saved cursor dict, or None if there is no checkpoint
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    if data.get("version") != VERSION:
+        raise ValueError(f"{path}: unsupported checkpoint version {data.get('version')!r}")
+    return data
+
+def check_cursor(plan, data):
+    # Raise ValueError unless `data` is a valid cursor into `plan`
+    if data["fingerprint"] != plan_fingerprint(plan):
+        raise ValueError("checkpoint was made for a different test sequence")
+    try:
+        check_position(plan, data["pc"], data["counters"])
+    except ValueError as e:
+        raise ValueError(f"checkpoint {e}")
+
+class Checkpoint:
+    def __init__(self, plan, path=CHECKPOINT_FILE, interval=CHECKPOINT_INTERVAL, clock=time.monotonic):
+        self.path = path
+        self.interval = interval
+        self.clock = clock
+        self.fingerprint = plan_fingerprint(plan)
+        self.cursor = None
+        self.completed = 0
+        self.last_write = None
+
+    def update(self, pc, counters, completed):
+        # Record that everything before `pc` is done; write if it's time
+        self.cursor = (pc, list(counters))
+        self.completed = completed
+        now = self.clock()
+        if self.last_write is None or now - self.last_write >= self.interval:
+            self.write()
+            self.last_write = now
+
+    def write(self):
+        if self.cursor is None:
+            return
+        pc, counters = self.cursor
+        data = {"version": VERSION, "fingerprint": self.fingerprint, "pc": pc,
+                "counters": counters, "completed_steps": self.completed,
+                "saved_at": time.time()}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        # The run finished: nothing left to resume
+        self.cursor = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
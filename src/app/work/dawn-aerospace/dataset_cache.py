@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+# ------------------------------------------------------------------------------
+# Dataset manifests and cache
+#
+# Every generated output gets a manifest: <output>.manifest.json next to a
+# workbook, or manifest.json inside a table directory. It records the
+# generation parameters and the rows written per sheet.
+#
+#   {"version": 1, "scenario": <key>, "params": {...}, "rows": {sheet: n}}
+#
+# The scenario key is a hash of every parameter except the run lengths. Rows
+# depend only on their sample index and the per-chunk seeds, so two outputs of
+# the same scenario agree row for row over their common length, and a shorter
+# one can be extended (see telemetry_io.write_output's `existing`) instead of
+# regenerated.
+#
+# A DatasetCache keeps outputs at <cache>/<scenario key>/<rows key>/, so the
+# key is the full set of generation parameters. find() returns an exact match,
+# or else the longest cached output of the same scenario to extend.
+# ------------------------------------------------------------------------------
+VERSION = 1
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"can't key parameter value {value!r}")
+
+def params_key(params):
+    data = json.dumps(params, sort_keys=True, separators=(",", ":"), default=_json_default)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+def make_manifest(scenario, rows):
+    # scenario: the generation parameters apart from run lengths; rows: {sheet: n}
+    params = json.loads(json.dumps(scenario, default=_json_default))
+    return {"version": VERSION, "scenario": params_key(params), "params": params, "rows": dict(rows)}
+
+def manifest_path(output, fmt):
+    return f"{output}.manifest.json" if fmt == "xlsx" else os.path.join(output, "manifest.json")
+
+def read_manifest(output, fmt):
+    # The output's manifest, or None if it has none (or doesn't exist)
+    try:
+        with open(manifest_path(output, fmt), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get("version") != VERSION:
+        raise ValueError(f"{output}: unsupported manifest version {manifest.get('version')!r}")
+    return manifest
+
+def write_manifest(output, fmt, manifest):
+    path = manifest_path(output, fmt)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def covers(base, rows):
+    # True if every sheet of `base` has no more rows than `rows` asks for
+    return set(base) == set(rows) and all(base[s] <= rows[s] for s in rows)
+
+def copy_output(source, output, fmt):
+    # Copies an output and its manifest; a table directory is merged into
+    # `output`, replacing tables of the same name
+    if fmt == "xlsx":
+        shutil.copyfile(source, output)
+        shutil.copyfile(manifest_path(source, fmt), manifest_path(output, fmt))
+    else:
+        shutil.copytree(source, output, dirs_exist_ok=True)
+
+class DatasetCache:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _entry(self, manifest):
+        rows_key = params_key(manifest["rows"])[:16]
+        return os.path.join(self.directory, manifest["scenario"], rows_key)
+
+    def _output(self, entry, fmt):
+        return os.path.join(entry, "data.xlsx" if fmt == "xlsx" else "data")
+
+    def find(self, manifest, fmt):
+        # (cached output path, its manifest) for the longest cached output of
+        # the same scenario that `manifest` can extend, or None
+        scenario_dir = os.path.join(self.directory, manifest["scenario"])
+        if not os.path.isdir(scenario_dir):
+            return None
+        best = None
+        for name in os.listdir(scenario_dir):
+            output = self._output(os.path.join(scenario_dir, name), fmt)
+            try:
+                cached = read_manifest(output, fmt)
+            except ValueError:
+                continue
+            if cached is None or not covers(cached["rows"], manifest["rows"]):
+                continue
+            if best is None or sum(cached["rows"].values()) > sum(best[1]["rows"].values()):
+                best = (output, cached)
+        return best
+
+    def store(self, output, fmt, manifest):
+        # Adds a copy of `output` unless the cache already has it. Entries are
+        # copied to a temp directory and renamed, so a partial copy is never found.
+        entry = self._entry(manifest)
+        if os.path.exists(entry):
+            return entry
+        tmp = f"{entry}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        copy_output(output, self._output(tmp, fmt), fmt)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Stored by another process meanwhile
+            shutil.rmtree(tmp, ignore_errors=True)
+        return entry
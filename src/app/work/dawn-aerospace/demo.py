@@ -1,27 +1,15 @@
-import sys
-from openpyxl import Workbook
-from datetime import datetime, timedelta
-
-# OS-specific date/time format (includes seconds)
-if sys.platform.startswith("win"):
-    date_format = "%#m/%#d/%y %#H:%M:%S"
-else:
-    date_format = "%-m/%-d/%y %-H:%M:%S"
-
-def format_time(dt):
-    return dt.strftime(date_format)
-
-# Create the workbook and sheet
-wb = Workbook()
-ws = wb.active
-ws.title = "Thruster_1"
-ws.append(["time", "vDIG", "vACT", "Current_Draw"])
+import argparse
+from datetime import datetime
+from functools import partial
+import numpy as np
+from demografana import non_negative, positive
+from events import EventSchedule, load_events
+from telemetry_io import WRITERS, make_sheet, output_path, write_output
 
 # Simulation parameters
 start_time = datetime(2025, 2, 18, 0, 0, 0)
 total_seconds = 300  # 5 minutes
-interval = 1         # 1 second sampling
-num_points = total_seconds // interval
+rate = 1.0           # 1 second sampling
 
 # Spikes occur every 30 seconds, each lasting 1 second
 spike_starts = [30, 60, 90, 120, 150]
@@ -37,33 +25,58 @@ vDIG_spike = 10.0
 vACT_spike = 30.0
 current_spike = 2.0
 
-for i in range(num_points):
-    current_time = start_time + timedelta(seconds=i)
-    time_str = format_time(current_time)
+header = ["time", "vDIG", "vACT", "Current_Draw"]
+
+def spike_schedule(spike_starts, spike_duration, events=None):
+    # Spike windows [spike_start, spike_start + spike_duration) seconds on all
+    # three channels, plus any extra fault events (added last so they win)
+    schedule = EventSchedule()
+    for s_start in spike_starts:
+        schedule.add("spike", "Thruster_1.vDIG", s_start, spike_duration, vDIG_spike)
+        schedule.add("spike", "Thruster_1.vACT", s_start, spike_duration, vACT_spike)
+        schedule.add("spike", "Thruster_1.Current_Draw", s_start, spike_duration, current_spike)
+    schedule.extend(events or [])
+    return schedule
+
+def columns(i, rng, interval, schedule):
+    t = i * interval
+    base = [np.full(len(i), v) for v in (vDIG_base, vACT_base, current_base)]
+    return [np.round(c, 2) for c in schedule.apply_columns("Thruster_1", header[1:], t, base)]
 
-    # Check if we're in a 1-second spike window
-    # i.e. [spike_start, spike_start + 1)
-    in_spike = any(s_start <= i < s_start + spike_duration for s_start in spike_starts)
+def generate(output=None, fmt="xlsx", duration=total_seconds, rate=rate,
+             spike_starts=spike_starts, spike_duration=spike_duration, start=start_time, events=None):
+    interval = 1.0 / rate
+    schedule = spike_schedule(spike_starts, spike_duration, events)
+    sheet = make_sheet("Thruster_1", header, start, interval, int(round(duration * rate)),
+                       partial(columns, interval=interval, schedule=schedule))
+    output = output or output_path("thruster_spike_demo", fmt)
+    write_output([sheet], output, fmt)
+    return output
 
-    if in_spike:
-        # Spike
-        vDIG = vDIG_spike
-        vACT = vACT_spike
-        current = current_spike
-    else:
-        # Baseline
-        vDIG = vDIG_base
-        vACT = vACT_base
-        current = current_base
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a thruster spike demo dataset.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="output file (xlsx) or directory (other formats)")
+    parser.add_argument("--format", choices=list(WRITERS), default="xlsx",
+                        help="output backend; non-xlsx formats write one table per sheet into a directory")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=start_time,
+                        help="timestamp of the first sample (ISO format)")
+    parser.add_argument("--duration", type=non_negative, default=total_seconds, help="run length in seconds")
+    parser.add_argument("--rate", type=positive, default=rate, help="sample rate in Hz")
+    parser.add_argument("--spike-starts", type=float, nargs="*", default=spike_starts,
+                        help="spike start times in seconds")
+    parser.add_argument("--spike-duration", type=positive, default=spike_duration,
+                        help="spike length in seconds")
+    parser.add_argument("--events", default=None,
+                        help="JSON file of extra fault events (spike/dropout/ramp/stuck)")
+    return parser.parse_args(argv)
 
-    ws.append([
-        time_str,
-        round(vDIG, 2),
-        round(vACT, 2),
-        round(current, 2)
-    ])
+def main(argv=None):
+    args = parse_args(argv)
+    events = load_events(args.events) if args.events else None
+    output = generate(args.output, args.format, args.duration, args.rate,
+                      args.spike_starts, args.spike_duration, args.start, events)
+    print(f"Output '{output}' ({args.format}) created successfully.")
 
-# Save the workbook
-output_filename = "thruster_spike_demo.xlsx"
-wb.save(output_filename)
-print(f"Excel file '{output_filename}' created successfully.")
+if __name__ == "__main__":
+    main()
@@ -1,121 +1,304 @@
-import sys
-import random
-import math
-from openpyxl import Workbook
-from datetime import datetime, timedelta
-
-# Determine the correct date/time format based on OS (includes seconds)
-if sys.platform.startswith("win"):
-    date_format = "%#m/%#d/%y %#H:%M:%S"
-else:
-    date_format = "%-m/%-d/%y %-H:%M:%S"
-
-def format_time(dt):
-    return dt.strftime(date_format)
-
-wb = Workbook()
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+import numpy as np
+from dataset_cache import DatasetCache, copy_output, make_manifest, read_manifest, write_manifest
+from events import EventSchedule, load_events, snap_times
+from telemetry_io import CHUNK_ROWS, WRITERS, make_sheet, output_path, write_output
 
 # ------------------------------------------------------------------------------
-# 1. LDR_ADC Data (1-second interval for 10 minutes)
+# Vectorized generation engine
+#
+# Each sheet is computed as whole NumPy arrays (time axis, ramps, cycles, spikes
+# and noise) with one RNG call per channel, instead of one Python iteration per
+# row. Column functions receive the sample indices of one chunk and that chunk's
+# RNG, so long runs are generated chunk by chunk, optionally in worker
+# processes (see telemetry_io.iter_chunks). Workers parallelize the NumPy
+# generation; writing stays in this process, which for xlsx (openpyxl
+# serializing row by row) is the bulk of the run time.
+#
+# Patterns are defined in seconds (t = i * interval) rather than sample counts,
+# so changing the sample rate keeps the same waveform on a finer time axis.
+# Thruster spikes and any injected fault events come from an EventSchedule
+# (see events.py) applied to each chunk before rounding.
 # ------------------------------------------------------------------------------
-ws = wb.active
-ws.title = "LDR_ADC"
-ws.append(["time"] + [f"LDR{i}" for i in range(1, 9)])
-
-start = datetime(2025, 2, 18, 0, 0, 0)
-total_seconds_ldr = 600  # 10 minutes
-interval_ldr = 1         # 1 second per measurement
-num_points_ldr = total_seconds_ldr // interval_ldr
-
-for i in range(num_points_ldr):
-    current_time = start + timedelta(seconds=i * interval_ldr)
-    time_str = format_time(current_time)
+THRUSTER_HEADER = ["time", "vDIG", "vACT", "Current_Draw"]
+TANK_FEEDLINE_HEADER = ["time", "Tank_Ox", "Tank_FU", "Feedline_Ox", "Feedline_FU", "Tank_Pressure", "Feedline_Pressure"]
+
+def ldr_columns(i, rng, interval, channels, schedule, drop_period=30.0, drop_duration=5.0):
     # Every 30-second cycle, a 5-second drop to ~600
-    if (i % 30) < 5:
-        ldr_values = [random.randint(580, 620) for _ in range(8)]
-    else:
-        ldr_values = [1023 for _ in range(8)]
-    ws.append([time_str] + ldr_values)
+    # Compared on the events' microsecond grid, so float error in t can't put
+    # a boundary sample on the wrong side (see events.snap_times)
+    t = i * interval
+    in_drop = snap_times(t) % snap_times(drop_period) < snap_times(drop_duration)
+    # Drawn row by row (all channels of a sample together), so a sample's
+    # values don't depend on how many rows the chunk has
+    values = np.full((len(i), channels), 1023, dtype=np.int64)
+    values[in_drop] = rng.integers(580, 621, size=(int(in_drop.sum()), channels))
+    result = list(values.T)
+    names = [f"LDR{c}" for c in range(1, channels + 1)]
+    return schedule.apply_columns("LDR_ADC", names, t, result)
 
-# ------------------------------------------------------------------------------
-# 2. Thruster Data (4 Thrusters, every 3 seconds for 5 minutes)
-# ------------------------------------------------------------------------------
-total_seconds_thruster = 300  # 5 minutes
-interval_thruster = 3         # every 3 seconds
-num_points_thruster = total_seconds_thruster // interval_thruster  # 100 points
-
-for thruster in range(1, 5):
-    ws_thruster = wb.create_sheet(title=f"Thruster_{thruster}")
-    ws_thruster.append(["time", "vDIG", "vACT", "Current_Draw"])
-    for i in range(num_points_thruster):
-        current_time = start + timedelta(seconds=i * interval_thruster)
-        time_str = format_time(current_time)
-
-        if i % 10 == 0:
-            # Spike every 30 seconds
-            vDIG = 10.0
-            vACT = 30.0
-            current = 2.0
-        else:
-            # Baseline/incremental data
-            vDIG = 12.0 + thruster + i * 0.05
-            vACT = 11.5 + thruster + i * 0.04
-            current = 5.0 + thruster * 0.1 + i * 0.02
+def thruster_columns(i, rng, interval, thruster, schedule):
+    # Ramps are defined per 3 s, the original sample interval, so the slope
+    # doesn't depend on the rate. Spikes come from the schedule.
+    t = i * interval
+    steps = t / 3.0
+    vDIG = 12.0 + thruster + steps * 0.05
+    vACT = 11.5 + thruster + steps * 0.04
+    current = 5.0 + thruster * 0.1 + steps * 0.02
+    result = schedule.apply_columns(f"Thruster_{thruster}", THRUSTER_HEADER[1:], t, [vDIG, vACT, current])
+    return [np.round(c, 2) for c in result]
+
+def tank_feedline_columns(i, rng, interval, cycle_period, amplitude_tank, amplitude_feedline, schedule):
+    # Sinusoidal modulation for heat cycling (30-second period)
+    t = i * interval
+    cycle = np.sin(2 * np.pi * (t / cycle_period))
 
-        ws_thruster.append([time_str, round(vDIG, 2), round(vACT, 2), round(current, 2)])
+    # Tanks take longer to heat up, feedlines heat up faster
+    tank_ox = 40 + t * 0.015 + amplitude_tank * cycle
+    tank_fu = 38 + t * 0.015 + amplitude_tank * cycle
+    feedline_ox = 45 + t * 0.02 + amplitude_feedline * cycle
+    feedline_fu = 43 + t * 0.02 + amplitude_feedline * cycle
+
+    # Pressure data: baseline plus uniform noise (around 101 / 100 kPa), drawn
+    # row by row like the LDR drops
+    noise = rng.uniform(-1, 1, (len(i), 2))
+    tank_pressure = 101 + noise[:, 0]
+    feedline_pressure = 100 + noise[:, 1]
+
+    result = [tank_ox, tank_fu, feedline_ox, feedline_fu, tank_pressure, feedline_pressure]
+    result = schedule.apply_columns("Tank_Feedline", TANK_FEEDLINE_HEADER[1:], t, result)
+    return [np.round(c, 2) for c in result]
+
+# Each sheet gets its own random stream: (seed, SHEET_KEYS[kind], thruster)
+SHEET_KEYS = {"ldr": 1, "thruster": 2, "tank_feedline": 3}
+
+def num_points(duration, rate):
+    return int(round(duration * rate))
+
+def thruster_spike_schedule(thruster, rate=1 / 3, spike_period=30.0, schedule=None):
+    # One-sample spike every 30 seconds on all three thruster channels
+    schedule = schedule if schedule is not None else EventSchedule()
+    interval = 1.0 / rate
+    for name, value in zip(THRUSTER_HEADER[1:], (10.0, 30.0, 2.0)):
+        schedule.add_periodic("spike", f"Thruster_{thruster}.{name}", spike_period, interval, value)
+    return schedule
+
+def generate_ldr(seed, start, total_seconds=600, rate=1.0, channels=8, schedule=None):
+    interval = 1.0 / rate
+    schedule = EventSchedule() if schedule is None else schedule
+    header = ["time"] + [f"LDR{c}" for c in range(1, channels + 1)]
+    return make_sheet("LDR_ADC", header, start, interval, num_points(total_seconds, rate),
+                      partial(ldr_columns, interval=interval, channels=channels,
+                              schedule=schedule),
+                      seed_key=(seed, SHEET_KEYS["ldr"], 0))
+
+def generate_thruster(seed, thruster, start, total_seconds=300, rate=1 / 3, schedule=None):
+    interval = 1.0 / rate
+    if schedule is None:
+        schedule = thruster_spike_schedule(thruster, rate)
+    return make_sheet(f"Thruster_{thruster}", THRUSTER_HEADER, start, interval, num_points(total_seconds, rate),
+                      partial(thruster_columns, interval=interval, thruster=thruster, schedule=schedule),
+                      seed_key=(seed, SHEET_KEYS["thruster"], thruster))
+
+def generate_tank_feedline(seed, start, total_seconds=600, rate=1.0,
+                           cycle_period=30.0, amplitude_tank=2.0, amplitude_feedline=3.0, schedule=None):
+    interval = 1.0 / rate
+    schedule = EventSchedule() if schedule is None else schedule
+    return make_sheet("Tank_Feedline", TANK_FEEDLINE_HEADER, start, interval, num_points(total_seconds, rate),
+                      partial(tank_feedline_columns, interval=interval, cycle_period=cycle_period,
+                              amplitude_tank=amplitude_tank, amplitude_feedline=amplitude_feedline,
+                              schedule=schedule),
+                      seed_key=(seed, SHEET_KEYS["tank_feedline"], 0))
 
 # ------------------------------------------------------------------------------
-# 3. Tank & Feedline Data (every second for 10 minutes, with 30-second heat cycling, offset baselines, and pressure)
+# Function API
+#
+#   1. LDR_ADC Data (1 Hz for 10 minutes, 8 channels)
+#   2. Thruster Data (4 Thrusters, every 3 seconds for 5 minutes)
+#   3. Tank & Feedline Data (1 Hz for 10 minutes, with 30-second heat cycling,
+#      offset baselines, and pressure)
 # ------------------------------------------------------------------------------
-ws_tf = wb.create_sheet(title="Tank_Feedline")
-ws_tf.append(["time", "Tank_Ox", "Tank_FU", "Feedline_Ox", "Feedline_FU", "Tank_Pressure", "Feedline_Pressure"])
-
-total_seconds_tf = 600  # 10 minutes
-interval_tf = 1         # 1 second per measurement
-num_points_tf = total_seconds_tf // interval_tf
-
-# For a 30-second cycle, set cycle period accordingly.
-cycle_period = 30  
-# Define amplitudes (how much the cycle modulates the temperature)
-amplitude_tank = 2.0      # Tanks have a smaller modulation amplitude
-amplitude_feedline = 3.0  # Feedlines modulate more
-
-for i in range(num_points_tf):
-    current_time = start + timedelta(seconds=i * interval_tf)
-    time_str = format_time(current_time)
-    
-    # Baseline: Tanks take longer to heat up (start lower, increase slower)
-    tank_ox_baseline = 40 + i * 0.015
-    tank_fu_baseline = 38 + i * 0.015
-    # Feedlines heat up faster (start higher, increase quicker)
-    feedline_ox_baseline = 45 + i * 0.02
-    feedline_fu_baseline = 43 + i * 0.02
-    
-    # Sinusoidal modulation for heat cycling (30-second period)
-    cycle = math.sin(2 * math.pi * (i / cycle_period))
-    
-    tank_ox = tank_ox_baseline + amplitude_tank * cycle
-    tank_fu = tank_fu_baseline + amplitude_tank * cycle
-    feedline_ox = feedline_ox_baseline + amplitude_feedline * cycle
-    feedline_fu = feedline_fu_baseline + amplitude_feedline * cycle
-    
-    # Pressure data: simulate with a baseline and some random noise
-    tank_pressure = 101 + random.uniform(-1, 1)       # e.g., around 101 kPa
-    feedline_pressure = 100 + random.uniform(-1, 1)     # e.g., around 100 kPa
-
-    ws_tf.append([
-        time_str,
-        round(tank_ox, 2),
-        round(tank_fu, 2),
-        round(feedline_ox, 2),
-        round(feedline_fu, 2),
-        round(tank_pressure, 2),
-        round(feedline_pressure, 2)
-    ])
+DEFAULTS = {
+    "start": datetime(2025, 2, 18, 0, 0, 0),
+    "ldr_duration": 600,
+    "ldr_rate": 1.0,
+    "ldr_channels": 8,
+    "thruster_duration": 300,
+    "thruster_rate": 1 / 3,
+    "thrusters": 4,
+    "spike_period": 30.0,
+    "tank_duration": 600,
+    "tank_rate": 1.0,
+    "cycle_period": 30.0,
+    "events": None,  # extra fault events, see events.EventSchedule.extend
+}
+
+def new_seed():
+    return int(np.random.SeedSequence().entropy % 2**63)
+
+def generate_sheets(seed, **params):
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f"Unknown generation parameter(s): {', '.join(sorted(unknown))}")
+    p = {**DEFAULTS, **params}
+
+    # One schedule per sheet so worker processes only receive their own events
+    events = {}
+    for e in p["events"] or []:
+        events.setdefault(e["channel"].split(".", 1)[0], []).append(e)
+
+    sheets = [generate_ldr(seed, p["start"], p["ldr_duration"], p["ldr_rate"], p["ldr_channels"],
+                           EventSchedule(events.get("LDR_ADC")))]
+    for thruster in range(1, p["thrusters"] + 1):
+        # Injected events are added after the built-in spikes so they take precedence
+        schedule = thruster_spike_schedule(thruster, p["thruster_rate"], p["spike_period"])
+        schedule.extend(events.get(f"Thruster_{thruster}", []))
+        sheets.append(generate_thruster(seed, thruster, p["start"], p["thruster_duration"],
+                                        p["thruster_rate"], schedule))
+    sheets.append(generate_tank_feedline(seed, p["start"], p["tank_duration"], p["tank_rate"], p["cycle_period"],
+                                         schedule=EventSchedule(events.get("Tank_Feedline"))))
+    return sheets
+
+# Bump when the generated signals change, so cached outputs aren't reused
+GENERATOR_VERSION = 1
+DURATION_PARAMS = ("ldr_duration", "thruster_duration", "tank_duration")
+
+def dataset_manifest(seed, fmt, sheets, **params):
+    # Manifest of an output of these sheets (see dataset_cache.py). Run lengths
+    # only set the row counts, so they are left out of the scenario key.
+    p = {**DEFAULTS, **params}
+    scenario = {key: value for key, value in p.items() if key not in DURATION_PARAMS}
+    scenario.update(seed=seed, format=fmt, chunk_rows=CHUNK_ROWS, generator=GENERATOR_VERSION)
+    return make_manifest(scenario, {sheet["title"]: sheet["num_points"] for sheet in sheets})
+
+def generate(output=None, fmt="xlsx", seed=None, workers=0, append=False, cache=None, **params):
+    # Generates and writes the dataset; returns (output path, seed used).
+    # A seed is always drawn up front so every worker shares the same streams.
+    #
+    # append: continue each sheet of an existing output of the same scenario
+    # from its last row instead of rewriting it; without a seed, the existing
+    # output's seed is reused. cache: a cache directory; outputs are reused
+    # from it when the parameters match, or extended from the longest cached
+    # output of the same scenario. Only seeded runs are cached, since a fresh
+    # random seed never matches.
+    output = output or output_path("dashboard_mock_data", fmt)
+    current = read_manifest(output, fmt) if append else None
+    if seed is None and current is not None:
+        seed = current["params"]["seed"]
+    cache = DatasetCache(cache) if cache and seed is not None else None
+    seed = new_seed() if seed is None else seed
+    sheets = generate_sheets(seed, **params)
+    manifest = dataset_manifest(seed, fmt, sheets, **params)
+
+    existing = {}
+    if append:
+        if current is not None:
+            if current["scenario"] != manifest["scenario"]:
+                raise ValueError(f"{output} was generated with different parameters; "
+                                 "only the run lengths can change when appending")
+            existing = current["rows"]
+    if cache is not None and existing != manifest["rows"]:
+        hit = cache.find(manifest, fmt)
+        if hit is not None and sum(hit[1]["rows"].values()) > sum(existing.values()):
+            copy_output(hit[0], output, fmt)
+            existing = hit[1]["rows"]
+
+    if existing != manifest["rows"]:
+        workers = os.cpu_count() if workers < 0 else workers
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                write_output(sheets, output, fmt, executor, existing, workers)
+        else:
+            write_output(sheets, output, fmt, existing=existing)
+        write_manifest(output, fmt, manifest)
+        if cache is not None:
+            cache.store(output, fmt, manifest)
+    return output, seed
 
 # ------------------------------------------------------------------------------
-# Save the workbook
+# Command line
 # ------------------------------------------------------------------------------
-output_filename = "dashboard_mock_data.xlsx"
-wb.save(output_filename)
-print(f"Excel file '{output_filename}' created successfully.")
+def positive(value):
+    # argparse type for rates and periods
+    number = float(value)
+    if not number > 0 or number == float("inf"):
+        raise argparse.ArgumentTypeError(f"expected a positive number, got '{value}'")
+    return number
+
+def non_negative(value):
+    # argparse type for durations (0 gives empty sheets)
+    number = float(value)
+    if not number >= 0 or number == float("inf"):
+        raise argparse.ArgumentTypeError(f"expected a number >= 0, got '{value}'")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate mock Grafana dashboard telemetry.")
+    parser.add_argument("-o", "--output", default=None,
+                        help="output file (xlsx) or directory (other formats)")
+    parser.add_argument("--format", choices=list(WRITERS), default="xlsx",
+                        help="output backend; non-xlsx formats write one table per sheet into a directory")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random channels")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes for parallel generation (0 = serial, -1 = all cores); "
+                             "rows are still written serially, so xlsx output gains little")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=DEFAULTS["start"],
+                        help="timestamp of the first sample (ISO format)")
+    parser.add_argument("--append", action="store_true",
+                        help="extend an existing output of the same scenario to the given durations, "
+                             "generating only the new rows (reuses its seed unless --seed is given)")
+    parser.add_argument("--cache", default=None,
+                        help="cache directory: reuse or extend earlier outputs with the same parameters "
+                             "(seeded runs only)")
+
+    scale = parser.add_argument_group("scale (applies to every sheet unless overridden below)")
+    scale.add_argument("--duration", type=non_negative, help="run length in seconds")
+    scale.add_argument("--rate", type=positive, help="sample rate in Hz")
+
+    sheets = parser.add_argument_group("per-sheet settings")
+    sheets.add_argument("--ldr-duration", type=non_negative)
+    sheets.add_argument("--ldr-rate", type=positive)
+    sheets.add_argument("--ldr-channels", type=int, default=DEFAULTS["ldr_channels"])
+    sheets.add_argument("--thruster-duration", type=non_negative)
+    sheets.add_argument("--thruster-rate", type=positive)
+    sheets.add_argument("--thrusters", type=int, default=DEFAULTS["thrusters"])
+    sheets.add_argument("--spike-period", type=positive, default=DEFAULTS["spike_period"],
+                        help="seconds between thruster spikes")
+    sheets.add_argument("--tank-duration", type=non_negative)
+    sheets.add_argument("--tank-rate", type=positive)
+    sheets.add_argument("--cycle-period", type=positive, default=DEFAULTS["cycle_period"],
+                        help="tank/feedline heat cycle period in seconds")
+    sheets.add_argument("--events", default=None,
+                        help="JSON file of fault events (spike/dropout/ramp/stuck) on '<sheet>.<column>' channels")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    params = {
+        "start": args.start,
+        "ldr_channels": args.ldr_channels,
+        "thrusters": args.thrusters,
+        "spike_period": args.spike_period,
+        "cycle_period": args.cycle_period,
+        "events": load_events(args.events) if args.events else None,
+    }
+    for sheet in ("ldr", "thruster", "tank"):
+        duration = getattr(args, f"{sheet}_duration")
+        rate = getattr(args, f"{sheet}_rate")
+        duration = args.duration if duration is None else duration
+        rate = args.rate if rate is None else rate
+        if duration is not None:
+            params[f"{sheet}_duration"] = duration
+        if rate is not None:
+            params[f"{sheet}_rate"] = rate
+
+    output, seed = generate(args.output, args.format, args.seed, args.workers, args.append, args.cache, **params)
+    print(f"Output '{output}' ({args.format}) created successfully (seed {seed}).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+from scheduler import COMMAND_SLOT
+from sequence_plan import OP_COMMAND, OP_DELAY, OP_LOOP, OP_END_LOOP, PlanCursor, EV_COMMAND, EV_DELAY, EV_LOOP, EV_ITERATION
+
+# ------------------------------------------------------------------------------
+# Dry runs
+#
+# Nominal timing of a compiled plan without sending anything or sleeping. The
+# executor plans every step against absolute deadlines (see scheduler.py), so a
+# run's nominal length is exactly COMMAND_SLOT per command plus the delays.
+#
+# estimate() walks the plan once, multiplying each step by the product of its
+# enclosing loop counts, so totals cost O(plan length) no matter how many
+# iterations the loops expand to. timeline() replays the plan on a virtual
+# clock (driving the same sequence_plan.PlanCursor as the executors) and yields
+# every step with its planned start time; it is a generator, so callers can
+# take only as much of a huge run as they need.
+# ------------------------------------------------------------------------------
+def estimate(plan, command_slot=COMMAND_SLOT):
+    ops, args = plan.ops, plan.args
+    mult = [1]  # iterations of the current step, per enclosing loop level
+    totals = {"commands": 0, "node_sends": 0, "delays": 0, "delay_seconds": 0.0,
+              "loops": 0, "loop_iterations": 0, "max_depth": 0, "by_command": {}}
+    by_command = totals["by_command"]
+
+    for pc in range(len(ops)):
+        op = ops[pc]
+        n = mult[-1]
+        if op == OP_COMMAND:
+            cmd, nodes = args[pc]
+            totals["commands"] += n
+            totals["node_sends"] += n * max(1, len(nodes))
+            by_command[cmd] = by_command.get(cmd, 0) + n
+        elif op == OP_DELAY:
+            totals["delays"] += n
+            totals["delay_seconds"] += n * args[pc]
+        elif op == OP_LOOP:
+            count = args[pc][0]
+            totals["loops"] += n
+            totals["loop_iterations"] += n * count
+            mult.append(n * count)
+            totals["max_depth"] = max(totals["max_depth"], len(mult) - 1)
+        elif op == OP_END_LOOP:
+            mult.pop()
+
+    totals["steps"] = totals["commands"] + totals["delays"]
+    totals["seconds"] = totals["commands"] * command_slot + totals["delay_seconds"]
+    return totals
+
+def timeline(plan, command_slot=COMMAND_SLOT):
+    # Yields (planned start in seconds, label) for every step the executor would
+    # log, in order, with loops expanded
+    args, labels = plan.args, plan.labels
+    cursor = PlanCursor(plan)
+    counters = cursor.counters
+    t = 0.0
+
+    for event, pc in cursor.walk():
+        if event == EV_COMMAND:
+            yield t, labels[pc]
+            t += command_slot
+        elif event == EV_DELAY:
+            yield t, labels[pc]
+            t += args[pc]
+        elif event == EV_LOOP:
+            yield t, labels[pc]
+        elif event == EV_ITERATION:
+            yield t, labels[pc].format(counters[-1])
+
+def format_duration(seconds):
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    days, hours = divmod(hours, 24)
+    text = f"{hours:02d}:{minutes:02d}:{secs:04.1f}"
+    return f"{days}d {text}" if days else text
+
+def summary(totals):
+    by_command = ", ".join(f"{cmd} x{n}" for cmd, n in sorted(totals["by_command"].items()))
+    return [
+        f"Nominal duration: {format_duration(totals['seconds'])} ({totals['seconds']:.1f} s)",
+        f"Steps: {totals['steps']} ({totals['commands']} commands, {totals['delays']} delays "
+        f"totalling {totals['delay_seconds']:g} s)",
+        f"Node sends: {totals['node_sends']}",
+        f"Loops: {totals['loops']} entered, {totals['loop_iterations']} iterations, "
+        f"nesting depth {totals['max_depth']}",
+        f"Commands: {by_command or 'none'}",
+    ]
@@ -0,0 +1,168 @@
+import heapq
+import json
+import numpy as np
+
+# ------------------------------------------------------------------------------
+# Event schedule for injected faults
+#
+# Events target one channel, named "<sheet>.<column>" (e.g. "Thruster_3.vACT"),
+# and cover sample times start <= t < start + duration. Kinds, applied in this
+# order so the most disruptive wins:
+#
+#   ramp     add a linear drift from 0 up to `value` over the event
+#   spike    replace samples with `value`
+#   stuck    hold the channel at `value`
+#   dropout  replace samples with NaN (no value)
+#
+# One-off events of a channel and kind may overlap; where they do, the one
+# that started last is active (a short spike inside a long fault, then the
+# fault again). _build splits the timeline into non-overlapping segments, each
+# pointing at its active event, so a chunk is resolved with one searchsorted
+# over its sample times: O(samples * log(events)) instead of O(samples * events).
+# Periodic events are evaluated with a modulo and cost O(samples) each. Within
+# a kind, periodic events are applied after one-off events, in the order added.
+#
+# Sample times (i * interval) carry float error, so a sample meant to sit on an
+# event boundary can land just either side of it (at 7 Hz, 210/7 s > 30 s but
+# 211/7 s - 30 s < 1/7 s). Times are snapped to the nearest TIME_RESOLUTION
+# before comparing, which keeps a one-sample window at exactly one sample.
+# ------------------------------------------------------------------------------
+KINDS = ("ramp", "spike", "stuck", "dropout")
+TIME_RESOLUTION = 1e-6  # seconds; far finer than any sample interval
+
+def snap_times(t):
+    # Nearest multiple of TIME_RESOLUTION, as an int64 count
+    return np.round(np.asarray(t, dtype=float) / TIME_RESOLUTION).astype(np.int64)
+
+class EventSchedule:
+    def __init__(self, events=None):
+        self._events = []
+        self._periodic = []
+        self._index = None
+        if events:
+            self.extend(events)
+
+    def _check(self, kind, duration, value):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown event kind '{kind}' (expected one of {', '.join(KINDS)})")
+        if duration <= 0:
+            raise ValueError(f"Event duration must be positive, got {duration}")
+        if kind != "dropout" and value is None:
+            raise ValueError(f"'{kind}' events need a value")
+
+    def add(self, kind, channel, start, duration, value=None):
+        self._check(kind, duration, value)
+        self._events.append((kind, channel, float(start), float(duration), value))
+        self._index = None
+
+    def add_periodic(self, kind, channel, period, duration, value=None, offset=0.0):
+        self._check(kind, duration, value)
+        if not period >= TIME_RESOLUTION:
+            raise ValueError(f"Event period must be at least {TIME_RESOLUTION} s, got {period}")
+        self._periodic.append((kind, channel, float(offset), float(period), float(duration), value))
+        self._index = None
+
+    def extend(self, events):
+        # Dicts as found in an events file: {"kind", "channel", "start", "duration",
+        # "value"}, or {"kind", "channel", "period", "duration", "value", "offset"}
+        for e in events:
+            if "period" in e:
+                self.add_periodic(e["kind"], e["channel"], e["period"], e["duration"],
+                                  e.get("value"), e.get("offset", 0.0))
+            else:
+                self.add(e["kind"], e["channel"], e["start"], e["duration"], e.get("value"))
+
+    def __len__(self):
+        return len(self._events) + len(self._periodic)
+
+    @staticmethod
+    def _segments(starts, ends):
+        # Sweep over the (start-sorted) events: between consecutive boundaries
+        # the active event is the latest-starting one still running. Returns
+        # (segment starts, segment ends, active event index) with gaps left out.
+        seg_starts, seg_ends, seg_events = [], [], []
+        boundaries = sorted(set(starts.tolist()) | set(ends.tolist()))
+        running = []  # heap of (-index, end)
+        k = 0
+        for b0, b1 in zip(boundaries, boundaries[1:]):
+            while k < len(starts) and starts[k] <= b0:
+                heapq.heappush(running, (-k, ends[k]))
+                k += 1
+            while running and running[0][1] <= b0:
+                heapq.heappop(running)
+            if not running:
+                continue
+            active = -running[0][0]
+            if seg_events and seg_events[-1] == active and seg_ends[-1] == b0:
+                seg_ends[-1] = b1
+            else:
+                seg_starts.append(b0)
+                seg_ends.append(b1)
+                seg_events.append(active)
+        return np.array(seg_starts), np.array(seg_ends), np.array(seg_events, dtype=np.int64)
+
+    def _build(self):
+        grouped = {}
+        for kind, channel, start, duration, value in self._events:
+            grouped.setdefault((channel, kind), []).append((start, start + duration, value))
+
+        index = {}
+        for (channel, kind), events in grouped.items():
+            events.sort(key=lambda e: e[0])
+            starts = np.array([e[0] for e in events])
+            ends = np.array([e[1] for e in events])
+            values = np.array([np.nan if e[2] is None else e[2] for e in events], dtype=float)
+            segments = self._segments(snap_times(starts), snap_times(ends))
+            index.setdefault(channel, {}).setdefault(kind, []).append(("once", *segments, starts, ends, values))
+        for kind, channel, offset, period, duration, value in self._periodic:
+            offset, period, duration = (int(snap_times(x)) for x in (offset, period, duration))
+            index.setdefault(channel, {}).setdefault(kind, []).append(("periodic", offset, period, duration, value))
+        self._index = index
+
+    def __getstate__(self):
+        # The index is rebuilt lazily, so don't ship it to worker processes
+        return {"_events": self._events, "_periodic": self._periodic, "_index": None}
+
+    def apply(self, channel, t, values):
+        # Returns values with this channel's events applied at sample times t
+        if self._index is None:
+            self._build()
+        kinds = self._index.get(channel)
+        if not kinds:
+            return values
+
+        values = values.astype(float)
+        ts = snap_times(t)
+        for kind in KINDS:
+            for entry in kinds.get(kind, ()):
+                if entry[0] == "once":
+                    _, seg_starts, seg_ends, seg_events, starts, ends, event_values = entry
+                    idx = np.searchsorted(seg_starts, ts, side="right") - 1
+                    safe = np.maximum(idx, 0)
+                    mask = (idx >= 0) & (ts < seg_ends[safe])
+                    idx = seg_events[safe[mask]]
+                    start, length, value = starts[idx], ends[idx] - starts[idx], event_values[idx]
+                else:
+                    # Whole TIME_RESOLUTION steps, so the modulo is exact
+                    _, offset, period, length, value = entry
+                    phase = (ts - offset) % period
+                    mask = (ts >= offset) & (phase < length)
+                    start = (ts[mask] - phase[mask]) * TIME_RESOLUTION
+                    length = length * TIME_RESOLUTION
+                    value = np.nan if value is None else value
+
+                if kind == "ramp":
+                    values[mask] += value * (t[mask] - start) / length
+                elif kind == "dropout":
+                    values[mask] = np.nan
+                else:
+                    values[mask] = value
+        return values
+
+    def apply_columns(self, sheet_title, names, t, columns):
+        return [self.apply(f"{sheet_title}.{name}", t, c) for name, c in zip(names, columns)]
+
+def load_events(path):
+    # A JSON list of event dicts (see EventSchedule.extend)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -1,12 +1,20 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
-import json
+import math
 import threading
-import time
-import os
+import sys
+import queue
+from log_pipeline import LogPipeline
+from port_pool import ConnectionPool
+from sequence_engine import SequenceEngine
+from sequence_io import read_sequence, write_sequence
+from sequence_model import Command, Delay, Loop, Sequence
+
+SEQUENCE_FILETYPES = [("Test Sequences", "*.seq *.seq.gz"), ("JSON Files", "*.json"), ("All Files", "*.*")]
+LOAD_POLL_MS = 50
 
 # Global data structures
-test_sequence = []
+test_sequence = Sequence()  # steps with stable ids; tree item IDs are str(step.id)
 node_list = []  # e.g. [{"name": "Node1", "scid": 5, "com": "COM3"}, ...]
 
 ##############################################################################
@@ -18,8 +26,11 @@ class TestSuiteGUI(tk.Tk):
         self.title("SIDELOADING Test Suite Builder for life cycle testing")
         self.geometry("1200x600")
 
-        # Map from TreeView item ID -> the actual dict item in test_sequence
-        self.tree_item_map = {}
+        # Loops whose children haven't been inserted yet: loop ID -> placeholder ID
+        self.tree_placeholders = {}
+
+        # Sequences read by background load threads, applied on the Tk thread
+        self.load_results = queue.SimpleQueue()
 
         # For auto-naming nodes if left blank
         self.node_name_counter = 1
@@ -27,9 +38,6 @@ class TestSuiteGUI(tk.Tk):
         # Dummy variable (no backend functionality)
         self.dummy_interface = None
 
-        # Dummy variable to mimic a process (not used)
-        self.tlm_src_process = None
-
         # Layout: left side = TreeView, right side = node manager + action buttons
         container = ttk.Frame(self)
         container.pack(fill="both", expand=True, padx=10, pady=10)
@@ -48,6 +56,16 @@ class TestSuiteGUI(tk.Tk):
         # Logging
         self.log_box = scrolledtext.ScrolledText(self, height=10)
         self.log_box.pack(fill="x", padx=10, pady=5)
+        self.log_pipeline = LogPipeline(self.log_box)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Validation, dry runs and execution (shared with run_sequence.py)
+        self.engine = SequenceEngine(self.log)
+
+    def on_close(self):
+        self.engine.stop_tlm_capture()
+        self.log_pipeline.close()
+        self.destroy()
 
     # ------------------------------------------------------------------------
     # 1. TreeView
@@ -58,6 +76,7 @@ class TestSuiteGUI(tk.Tk):
         self.tree.heading("#0", text="Step")
         self.tree.heading("Description", text="Description")
         self.tree.pack(fill="both", expand=True)
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
 
     # ------------------------------------------------------------------------
     # 2. Node Manager
@@ -185,19 +204,24 @@ class TestSuiteGUI(tk.Tk):
         run_frame = ttk.LabelFrame(action_frame, text="Execute")
         run_frame.pack(fill="x", padx=5, pady=5)
         
-        run_btn = ttk.Button(run_frame, text="▶️ Run Test Suite", command=self.run_suite_threaded)
-        run_btn.pack(pady=5, fill="x")
+        self.run_btn = ttk.Button(run_frame, text="▶️ Run Test Suite", command=self.run_suite_threaded)
+        self.run_btn.pack(pady=5, fill="x")
         style = ttk.Style()
         style.configure("Run.TButton", foreground="green")
-        run_btn.configure(style="Run.TButton")
+        self.run_btn.configure(style="Run.TButton")
+
+        self.resume_btn = ttk.Button(run_frame, text="⏯️ Resume Run", command=lambda: self.run_suite_threaded(resume=True))
+        self.resume_btn.pack(pady=2, fill="x")
+        ttk.Button(run_frame, text="🧪 Dry Run", command=self.dry_run).pack(pady=2, fill="x")
+        ttk.Button(run_frame, text="📊 Export Trace", command=self.export_trace).pack(pady=2, fill="x")
 
     # ------------------------------------------------------------------------
     # 4. Logging
     # ------------------------------------------------------------------------
     def log(self, msg):
-        self.log_box.insert(tk.END, msg + "\n")
-        self.log_box.see(tk.END)
-        print(msg)
+        # Safe from any thread: lines are queued and the Tk main loop inserts
+        # them in batches; the full log goes to a rotating file
+        self.log_pipeline.log(msg)
 
     # ------------------------------------------------------------------------
     # 5. Add Command / Delay / Loop
@@ -237,13 +261,7 @@ class TestSuiteGUI(tk.Tk):
                 return
 
             selected_nodes = [node_list[i] for i in sel_indices] if sel_indices else []
-            cmd_item = {
-                "type": "command",
-                "command": selected_command,
-                "nodes": selected_nodes
-            }
-            test_sequence.append(cmd_item)
-            self.add_item_to_tree(cmd_item)
+            self.add_item_to_tree(test_sequence.add(Command(selected_command, selected_nodes)))
             dialog.destroy()
 
         ttk.Button(dialog, text="OK", command=on_ok).grid(row=2, column=0, columnspan=2, pady=10)
@@ -258,13 +276,15 @@ class TestSuiteGUI(tk.Tk):
 
         def on_ok():
             try:
-                secs = int(delay_var.get())
-                delay_item = {"type": "delay", "seconds": secs}
-                test_sequence.append(delay_item)
-                self.add_item_to_tree(delay_item)
+                secs = float(delay_var.get())
+                if not (math.isfinite(secs) and secs >= 0):
+                    raise ValueError
+                # Keep whole seconds as ints so saved sequences look the same
+                delay_step = Delay(int(secs) if secs.is_integer() else secs)
+                self.add_item_to_tree(test_sequence.add(delay_step))
                 dialog.destroy()
             except ValueError:
-                self.log("Delay must be an integer!")
+                self.log("Delay must be a finite, non-negative number of seconds!")
 
         ttk.Button(dialog, text="OK", command=on_ok).grid(row=1, column=0, columnspan=2, pady=10)
 
@@ -279,9 +299,7 @@ class TestSuiteGUI(tk.Tk):
         def on_ok():
             try:
                 count = int(count_var.get())
-                loop_item = {"type": "loop", "count": count, "tasks": []}
-                test_sequence.append(loop_item)
-                self.add_item_to_tree(loop_item)
+                self.add_item_to_tree(test_sequence.add(Loop(count)))
                 dialog.destroy()
             except ValueError:
                 self.log("Repeat count must be an integer!")
@@ -291,111 +309,108 @@ class TestSuiteGUI(tk.Tk):
     # ------------------------------------------------------------------------
     # 6. Tree Management
     # ------------------------------------------------------------------------
-    def add_item_to_tree(self, item, parent=""):
-        if item["type"] == "command":
-            node_names = [n["name"] for n in item["nodes"]]
+    # The tree is kept in sync with targeted insert/move/delete calls instead of
+    # being rebuilt. A loop's children are only inserted when it is first
+    # expanded; until then it holds a single placeholder so Tk shows the arrow.
+    def _tree_text(self, step):
+        if step.kind == "command":
+            node_names = [n["name"] for n in step.nodes]
             node_str = ", ".join(node_names)
-            label = f"{item['command']} -> [{node_str}]" if node_names else f"{item['command']}"
-            tree_id = self.tree.insert(parent, tk.END, text="Command", values=(label,))
-        elif item["type"] == "delay":
-            label = f"Delay {item['seconds']}s"
-            tree_id = self.tree.insert(parent, tk.END, text="Delay", values=(label,))
-        elif item["type"] == "loop":
-            label = f"Loop x{item['count']}"
-            tree_id = self.tree.insert(parent, tk.END, text="Loop", values=(label,))
-        else:
+            label = f"{step.command} -> [{node_str}]" if node_names else f"{step.command}"
+            return "Command", label
+        elif step.kind == "delay":
+            return "Delay", f"Delay {step.seconds}s"
+        elif step.kind == "loop":
+            return "Loop", f"Loop x{step.count}"
+        return None, None
+
+    def tree_step(self, tree_id):
+        # The sequence step behind a tree item (None for placeholders)
+        return test_sequence.steps.get(int(tree_id)) if tree_id.isdigit() else None
+
+    def add_item_to_tree(self, step, parent="", index=tk.END):
+        text, label = self._tree_text(step)
+        if text is None:
+            return None
+
+        tree_id = self.tree.insert(parent, index, iid=str(step.id), text=text, values=(label,))
+        if step.kind == "loop" and step.tasks:
+            self.tree_placeholders[tree_id] = self.tree.insert(tree_id, tk.END, iid=f"p{step.id}", text="...")
+        return tree_id
+
+    def on_tree_open(self, event=None):
+        self.populate_children(self.tree.focus())
+
+    def populate_children(self, tree_id):
+        placeholder = self.tree_placeholders.pop(tree_id, None)
+        if placeholder is None:
             return
-
-        self.tree_item_map[tree_id] = item
+        self.tree.delete(placeholder)
+        for child in self.tree_step(tree_id).tasks:
+            self.add_item_to_tree(child, tree_id)
 
     def rebuild_tree(self):
+        # Full reset, only used when a whole sequence is loaded
         self.tree.delete(*self.tree.get_children())
-        self.tree_item_map.clear()
-        for item in test_sequence:
-            self.add_item_to_tree(item)
+        self.tree_placeholders.clear()
+        for step in test_sequence:
+            self.add_item_to_tree(step)
+
+    def selected_steps(self):
+        steps = [self.tree_step(sid) for sid in self.tree.selection()]
+        return [step for step in steps if step is not None]
 
     def delete_selected_item(self):
-        selected_ids = self.tree.selection()
-        if not selected_ids:
+        steps = self.selected_steps()
+        if not steps:
             self.log("No item selected to delete.")
             return
 
-        items_to_remove = [self.tree_item_map[sid] for sid in selected_ids if sid in self.tree_item_map]
-
-        for sid in selected_ids:
-            if sid in self.tree_item_map:
-                del self.tree_item_map[sid]
-            self.tree.delete(sid)
-
-        for i in items_to_remove:
-            if i in test_sequence:
-                test_sequence.remove(i)
+        top = test_sequence.top_level_only(steps)
+        for step in test_sequence.remove(top):
+            self.tree_placeholders.pop(str(step.id), None)
+        self.tree.delete(*[str(step.id) for step in top])
 
         self.log("Deleted selected item(s).")
 
-    def move_selected_up(self):
+    def move_selected(self, offset):
         selected_ids = self.tree.selection()
+        direction = "up" if offset < 0 else "down"
         if len(selected_ids) != 1:
-            self.log("Please select exactly one item to move up.")
+            self.log(f"Please select exactly one item to move {direction}.")
             return
 
-        sid = selected_ids[0]
-        item = self.tree_item_map.get(sid)
-        if not item:
+        step = self.tree_step(selected_ids[0])
+        if step is None:
             self.log("Selected item not found in map.")
             return
 
-        idx = next(i for i, obj in enumerate(test_sequence) if obj is item)
-        if idx == 0:
-            self.log("Item is already at the top.")
-            return
-
-        test_sequence[idx], test_sequence[idx - 1] = test_sequence[idx - 1], test_sequence[idx]
-        self.rebuild_tree()
-        self.log("Moved item up.")
-
-    def move_selected_down(self):
-        selected_ids = self.tree.selection()
-        if len(selected_ids) != 1:
-            self.log("Please select exactly one item to move down.")
+        new_idx = test_sequence.swap(step, offset)
+        if new_idx is None:
+            self.log(f"Item is already at the {'top' if offset < 0 else 'bottom'}.")
             return
 
-        sid = selected_ids[0]
-        item = self.tree_item_map.get(sid)
-        if not item:
-            self.log("Selected item not found in map.")
-            return
+        sid = str(step.id)
+        self.tree.move(sid, self.tree.parent(sid), new_idx)
+        self.tree.see(sid)
+        self.log(f"Moved item {direction}.")
 
-        idx = next(i for i, obj in enumerate(test_sequence) if obj is item)
-        if idx == len(test_sequence) - 1:
-            self.log("Item is already at the bottom.")
-            return
+    def move_selected_up(self):
+        self.move_selected(-1)
 
-        test_sequence[idx], test_sequence[idx + 1] = test_sequence[idx + 1], test_sequence[idx]
-        self.rebuild_tree()
-        self.log("Moved item down.")
+    def move_selected_down(self):
+        self.move_selected(1)
 
     def wrap_in_loop(self):
-        selected_ids = self.tree.selection()
-        if not selected_ids:
+        steps = test_sequence.top_level_only(self.selected_steps())
+        if not steps:
             self.log("No items selected to wrap in loop.")
             return
 
-        selected_items = []
-        for sid in selected_ids:
-            if sid in self.tree_item_map:
-                selected_items.append(self.tree_item_map[sid])
-
-        indices = []
-        for i in selected_items:
-            if i not in test_sequence:
-                self.log("Some selected item is not top-level or not found.")
-                return
-            indices.append(test_sequence.index(i))
+        if any(step.parent is not steps[0].parent for step in steps):
+            self.log("Selected items must all be in the same loop (or all top-level).")
+            return
 
-        # Sort indices in reverse order so we can remove items without affecting other indices
-        sorted_ix = sorted(indices, reverse=True)
-        
         dialog = tk.Toplevel(self)
         dialog.title("Wrap in Loop")
         ttk.Label(dialog, text="Loop repeat count:").grid(row=0, column=0, padx=5, pady=5)
@@ -405,16 +420,23 @@ class TestSuiteGUI(tk.Tk):
         def on_ok():
             try:
                 loop_count = int(count_var.get())
-                loop_item = {"type": "loop", "count": loop_count, "tasks": []}
-                for ix in sorted_ix[::-1]:
-                    loop_item["tasks"].insert(0, test_sequence.pop(ix))
-                first_ix = sorted_ix[0]
-                test_sequence.insert(first_ix, loop_item)
-                dialog.destroy()
-                self.rebuild_tree()
-                self.log(f"Wrapped {len(selected_items)} items in a new loop (x{loop_count}).")
             except ValueError:
                 self.log("Loop count must be an integer!")
+                return
+
+            parent = self.tree.parent(str(steps[0].id))
+            loop = test_sequence.wrap(steps, loop_count)
+
+            # Re-parent the existing tree items under the new loop, so nothing
+            # below them has to be re-inserted
+            loop_id = self.tree.insert(parent, test_sequence.index(loop), iid=str(loop.id),
+                                       text="Loop", values=(f"Loop x{loop_count}",))
+            for step in loop.tasks:
+                self.tree.move(str(step.id), loop_id, tk.END)
+            self.tree.item(loop_id, open=True)
+
+            dialog.destroy()
+            self.log(f"Wrapped {len(steps)} items in a new loop (x{loop_count}).")
 
         ttk.Button(dialog, text="OK", command=on_ok).grid(row=1, column=0, columnspan=2, pady=10)
 
@@ -424,20 +446,16 @@ class TestSuiteGUI(tk.Tk):
     def save_sequence(self):
         file_path = filedialog.asksaveasfilename(
             title="Save Sequence",
-            defaultextension=".json",
-            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+            defaultextension=".seq",
+            filetypes=SEQUENCE_FILETYPES
         )
         if not file_path:
             self.log("Save canceled.")
             return
 
-        data = {
-            "node_list": node_list,
-            "test_sequence": test_sequence
-        }
         try:
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
+            # Name the file .seq.gz to save it compressed
+            write_sequence(file_path, node_list, test_sequence)
             self.log(f"Saved sequence to {file_path}")
         except Exception as e:
             self.log(f"Error saving file: {e}")
@@ -445,69 +463,98 @@ class TestSuiteGUI(tk.Tk):
     def load_sequence(self):
         file_path = filedialog.askopenfilename(
             title="Load Sequence",
-            defaultextension=".json",
-            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+            filetypes=SEQUENCE_FILETYPES
         )
         if not file_path:
             self.log("Load canceled.")
             return
 
+        # Parse on a worker thread so large files don't freeze the UI; the
+        # result is picked up by _poll_load on the Tk thread
+        self.log(f"Loading sequence from {file_path}...")
+        threading.Thread(target=self._load_worker, args=(file_path,), daemon=True).start()
+        self.after(LOAD_POLL_MS, self._poll_load)
+
+    def _load_worker(self, file_path):
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            global node_list, test_sequence
-            node_list = data.get("node_list", [])
-            test_sequence = data.get("test_sequence", [])
-            self.refresh_node_listbox()
-            self.rebuild_tree()
-            self.log(f"Loaded sequence from {file_path}")
+            result = read_sequence(file_path, progress=lambda n: self.log(f"  {n} steps read..."))
+            self.load_results.put((file_path, result, None))
         except Exception as e:
-            self.log(f"Error loading sequence: {e}")
+            self.load_results.put((file_path, None, e))
+
+    def _poll_load(self):
+        try:
+            file_path, result, error = self.load_results.get_nowait()
+        except queue.Empty:
+            self.after(LOAD_POLL_MS, self._poll_load)
+            return
+
+        if error is not None:
+            self.log(f"Error loading sequence: {error}")
+            return
+
+        global node_list, test_sequence
+        node_list, test_sequence = result
+        self.refresh_node_listbox()
+        self.rebuild_tree()
+        self.log(f"Loaded sequence from {file_path} ({len(test_sequence)} steps)")
 
     # ------------------------------------------------------------------------
     # 8. Running the Test Suite (Dummy Implementation)
     # ------------------------------------------------------------------------
-    def run_suite_threaded(self):
-        t = threading.Thread(target=self.run_suite, daemon=True)
+    def run_suite_threaded(self, resume=False):
+        # One run at a time: Run/Resume stay disabled until the run thread ends
+        # (the engine refuses overlapping runs too)
+        if self.engine.running:
+            self.log("A test suite is already running.")
+            return
+        for button in (self.run_btn, self.resume_btn):
+            button.state(["disabled"])
+        t = threading.Thread(target=self.run_suite, args=(resume,), daemon=True)
         t.start()
+        self.after(LOAD_POLL_MS, self._poll_run, t)
+
+    def _poll_run(self, thread):
+        if thread.is_alive():
+            self.after(LOAD_POLL_MS, self._poll_run, thread)
+            return
+        for button in (self.run_btn, self.resume_btn):
+            button.state(["!disabled"])
+
+    def run_suite(self, resume=False):
+        self.engine.run(test_sequence.to_dicts(), resume)
+
+    def export_trace(self):
+        if self.engine.tracer is None:
+            self.log("Nothing to export: run the test suite first.")
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="Export Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome Trace", "*.json"), ("All Files", "*.*")]
+        )
+        if not file_path:
+            self.log("Export canceled.")
+            return
+        try:
+            self.engine.tracer.export_chrome_trace(file_path)
+            self.log(f"Exported trace to {file_path} (open in chrome://tracing or Perfetto)")
+        except Exception as e:
+            self.log(f"Error exporting trace: {e}")
 
-    def run_suite(self):
-        self.log("=== Running Test Suite ===")
-        self.execute_block(test_sequence)
-        self.log("=== Test Suite Complete ===")
-
-    def execute_block(self, block):
-        for item in block:
-            if item["type"] == "command":
-                self.handle_command(item)
-            elif item["type"] == "delay":
-                self.handle_delay(item)
-            elif item["type"] == "loop":
-                self.handle_loop(item)
-
-    def handle_command(self, item):
-        cmd = item["command"]
-        nodes = item.get("nodes", [])
-        node_names = ", ".join([n["name"] for n in nodes]) if nodes else "None"
-        self.log(f"Executing command '{cmd}' on nodes: {node_names} (dummy).")
-        time.sleep(1)
-
-    def handle_delay(self, item):
-        secs = item["seconds"]
-        self.log(f"Delaying for {secs} seconds (dummy)...")
-        time.sleep(secs)
-
-    def handle_loop(self, item):
-        count = item["count"]
-        tasks = item["tasks"]
-        self.log(f"Starting loop, repeating {count} times (dummy)...")
-        for i in range(count):
-            self.log(f"  Loop iteration {i+1}/{count}")
-            self.execute_block(tasks)
+    def dry_run(self):
+        self.engine.dry_run(test_sequence.to_dicts())
 
 ##############################################################################
 # Main
 ##############################################################################
 if __name__ == "__main__":
     app = TestSuiteGUI()
+    port_pool = None
+    if "--serial" in sys.argv[1:]:
+        # Send commands over persistent per-COM-port connections instead of the dummy backend
+        port_pool = ConnectionPool()
+        app.engine.send_command = port_pool.send_command
     app.mainloop()
+    if port_pool is not None:
+        port_pool.close()
@@ -0,0 +1,74 @@
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# ------------------------------------------------------------------------------
+# Thread-safe batched logging
+#
+# log() may be called from any thread and only enqueues. Two consumers:
+#   - the Tk main loop drains the UI queue on a timer (widget.after), inserts
+#     each batch with one text insert and trims the widget to the last
+#     max_lines lines, so the log box stays bounded on multi-hour runs;
+#   - a QueueListener thread writes every record to a rotating log file and
+#     the console, so file I/O never blocks the executor or the UI.
+# The widget is any Tk Text (e.g. ScrolledText); nothing here imports tkinter.
+# ------------------------------------------------------------------------------
+LOG_FILE = "test_suite.log"
+MAX_LOG_LINES = 5000
+DRAIN_INTERVAL_MS = 100
+MAX_BATCH = 1000  # lines inserted per drain, so a burst can't freeze the UI
+
+class LogPipeline:
+    def __init__(self, widget, log_file=LOG_FILE, max_lines=MAX_LOG_LINES,
+                 interval_ms=DRAIN_INTERVAL_MS, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.ui_queue = queue.SimpleQueue()
+
+        file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(asctime)s [%(threadName)s] %(message)s"))
+        console_handler = logging.StreamHandler(sys.stdout)
+
+        self.record_queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.record_queue, file_handler, console_handler)
+        self.listener.start()
+
+        self.logger = logging.getLogger(f"test_suite.{id(self)}")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(QueueHandler(self.record_queue))
+
+        self._after_id = self.widget.after(self.interval_ms, self.drain)
+
+    def log(self, msg):
+        self.ui_queue.put(msg)
+        self.logger.info(msg)
+
+    def drain(self):
+        batch = []
+        try:
+            while len(batch) < MAX_BATCH:
+                batch.append(self.ui_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        if batch:
+            self.widget.insert("end", "\n".join(batch) + "\n")
+            # The text always ends with an empty line after the last newline
+            lines = int(self.widget.index("end-1c").split(".")[0]) - 1
+            if lines > self.max_lines:
+                self.widget.delete("1.0", f"{lines - self.max_lines + 1}.0")
+            self.widget.see("end")
+
+        # Come straight back if there's a backlog, otherwise wait for the timer
+        delay = 1 if len(batch) == MAX_BATCH else self.interval_ms
+        self._after_id = self.widget.after(delay, self.drain)
+
+    def close(self):
+        self.widget.after_cancel(self._after_id)
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+# ------------------------------------------------------------------------------
+# Concurrent command dispatch
+#
+# A command step fans out to every target node at once; each node gets its own
+# timeout and the step finishes when the slowest node answers (or times out),
+# instead of after one blocking send per node. Commands without target nodes
+# (e.g. stop_tlm_src) are sent once with node=None.
+# ------------------------------------------------------------------------------
+COMMAND_TIMEOUT = 5.0  # seconds per node
+
+async def send_dummy(command, node):
+    # Stand-in for the real backend: every command takes one second
+    await asyncio.sleep(1)
+    return "ok"
+
+async def _send_one(send, command, node, timeout):
+    name = node["name"] if node else None
+    t0 = time.monotonic()
+    try:
+        result = await asyncio.wait_for(send(command, node), timeout)
+        return {"node": name, "ok": True, "result": result, "seconds": time.monotonic() - t0}
+    except asyncio.TimeoutError:
+        return {"node": name, "ok": False, "error": f"timed out after {timeout:g}s",
+                "seconds": time.monotonic() - t0}
+    except Exception as e:
+        return {"node": name, "ok": False, "error": str(e) or type(e).__name__,
+                "seconds": time.monotonic() - t0}
+
+async def dispatch(command, nodes, send=send_dummy, timeout=COMMAND_TIMEOUT):
+    # Returns one result dict per node, in the order of `nodes`
+    targets = list(nodes) or [None]
+    return await asyncio.gather(*(_send_one(send, command, node, timeout) for node in targets))
+
+def failures(results):
+    return [r for r in results if not r["ok"]]
@@ -0,0 +1,159 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# pyserial is only needed when talking to real ports (or its loop:// URL)
+try:
+    import serial
+except ImportError:
+    serial = None
+
+# ------------------------------------------------------------------------------
+# Per-COM-port connection pool
+#
+# Every COM port gets one long-lived connection and one I/O worker thread with
+# its own command queue. Nodes that share a port share its worker, so their
+# commands are serialized on the wire while different ports run in parallel.
+# A failed connection (write/read error, or no reply within READ_TIMEOUT) is
+# dropped and reopened with backoff for the next command. A command is only
+# sent again when the link broke before it went out (the write itself failed);
+# once the frame is on the wire the node may have acted on it (fire, arm,
+# switch_can ...), so a read error or timeout fails that command instead of
+# repeating it. Running out of open attempts raises PortOpenError, which is
+# not retried.
+#
+# `opener(port)` returns any object with write(bytes), readline() -> bytes and
+# close(), so tests can use a pty or pyserial's "loop://" instead of hardware.
+# ------------------------------------------------------------------------------
+BAUDRATE = 115200
+READ_TIMEOUT = 1.0
+
+class PortOpenError(ConnectionError):
+    # The port couldn't be (re)opened within connect_attempts
+    pass
+
+def open_serial(port):
+    if serial is None:
+        raise RuntimeError("Serial connections require pyserial (pip install pyserial)")
+    # serial_for_url also accepts plain device names (COM3, /dev/pts/4)
+    return serial.serial_for_url(port, baudrate=BAUDRATE, timeout=READ_TIMEOUT)
+
+def encode_command(command, node):
+    # Dummy wire format until the real protocol is wired in
+    scid = node["scid"] if node else 0
+    return f"{scid}:{command}\n".encode("ascii")
+
+class PortWorker(threading.Thread):
+    def __init__(self, port, opener=open_serial, connect_attempts=5,
+                 reconnect_delay=0.25, max_reconnect_delay=5.0):
+        super().__init__(name=f"port-{port}", daemon=True)
+        self.port = port
+        self.opener = opener
+        self.connect_attempts = connect_attempts
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.jobs = queue.Queue()
+        self.conn = None
+        self.reconnects = 0
+
+    def submit(self, frame):
+        future = Future()
+        self.jobs.put((frame, future))
+        return future
+
+    def stop(self):
+        self.jobs.put(None)
+
+    def _connect(self):
+        delay = self.reconnect_delay
+        for attempt in range(self.connect_attempts):
+            try:
+                self.conn = self.opener(self.port)
+                return
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.connect_attempts:
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+        raise PortOpenError(f"Could not open {self.port}: {error}")
+
+    def _disconnect(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def _send(self, frame):
+        if self.conn is None:
+            self._connect()
+        self.conn.write(frame)
+
+    def _receive(self):
+        reply = self.conn.readline()
+        if not reply:
+            # readline() returns b"" once READ_TIMEOUT expires
+            raise TimeoutError(f"No reply from {self.port}")
+        return reply
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            frame, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                try:
+                    self._send(frame)
+                except PortOpenError:
+                    raise
+                except Exception:
+                    # The link broke before the frame went out: reopen and send it once more
+                    self._disconnect()
+                    self.reconnects += 1
+                    self._send(frame)
+                # From here on the node may have acted on the frame, so never resend it
+                future.set_result(self._receive())
+            except Exception as e:
+                self._disconnect()
+                future.set_exception(e)
+        self._disconnect()
+
+class ConnectionPool:
+    def __init__(self, opener=open_serial, **worker_options):
+        self.opener = opener
+        self.worker_options = worker_options
+        self.workers = {}
+        self.lock = threading.Lock()
+
+    def worker(self, port):
+        with self.lock:
+            worker = self.workers.get(port)
+            if worker is None:
+                worker = self.workers[port] = PortWorker(port, self.opener, **self.worker_options)
+                worker.start()
+            return worker
+
+    def send(self, node, frame):
+        # Queue a frame on the node's port; returns a concurrent Future of the reply
+        return self.worker(node["com"]).submit(frame)
+
+    async def send_command(self, command, node):
+        # Drop-in for SequenceEngine.send_command / node_dispatch.dispatch
+        if node is None:
+            return None
+        reply = await asyncio.wrap_future(self.send(node, encode_command(command, node)))
+        return reply.decode("ascii", "replace").strip()
+
+    def close(self, timeout=2.0):
+        with self.lock:
+            workers, self.workers = list(self.workers.values()), {}
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            worker.join(timeout)
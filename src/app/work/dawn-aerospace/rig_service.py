@@ -0,0 +1,478 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from checkpoint import CHECKPOINT_INTERVAL, Checkpoint, check_cursor, load_checkpoint
+from dry_run import estimate
+from node_dispatch import COMMAND_TIMEOUT, dispatch, failures, send_dummy
+from scheduler import COMMAND_SLOT, DeadlineScheduler
+from sequence_io import read_sequence
+from sequence_plan import compile_sequence, PlanCursor, EV_COMMAND, EV_DELAY, EV_LOOP, EV_ITERATION
+
+# ------------------------------------------------------------------------------
+# Multi-rig execution service
+#
+# Hosts many independent sequence runs (one per test stand) in one process.
+# Every run is a task on a single asyncio event loop owned by the service
+# thread: waits are asyncio sleeps against the run's own absolute deadlines
+# (scheduler.DeadlineScheduler) and command fan-out awaits node_dispatch
+# directly, so an idle rig costs no thread and no CPU, just its compiled plan
+# and a short log.
+#
+# Each run has its own sequence, nodes, send backend, cursor and status, and
+# can be cancelled on its own. With a checkpoint directory, cursors are saved
+# to <dir>/<run name>.checkpoint.json (run names are plain slugs, so they can't
+# point outside it); one flusher writes every running rig's checkpoint each
+# CHECKPOINT_INTERVAL in a worker thread, and a run's final write/clear also
+# runs in one, so disk syncs never stall the loop. Cancelled or interrupted
+# runs can be resumed by name.
+#
+# Telemetry capture (run_tlm_src) is a GUI/run_sequence.py feature; here those
+# commands are only dispatched.
+#
+#   GET  /runs                 status of every run
+#   GET  /runs/<id>            status and recent log of one run
+#   POST /runs                 {"file": path, "name": ..., "resume": false}
+#   POST /runs/<id>/cancel     cancel a run
+# ------------------------------------------------------------------------------
+LOG_LINES = 200  # recent log lines kept per run
+ACTIVE = ("pending", "running")
+RUN_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")  # also the checkpoint file stem
+
+class RigRun:
+    def __init__(self, run_id, name, plan, send, checkpoint=None):
+        self.id = run_id
+        self.name = name
+        self.plan = plan
+        self.send = send
+        self.checkpoint = checkpoint
+        # Serializes the flusher's writes with the final write/clear
+        self.checkpoint_lock = threading.Lock()
+        totals = estimate(plan)
+        self.steps = totals["steps"]
+        self.nominal_seconds = totals["seconds"]
+
+        self.state = "pending"
+        self.label = None
+        self.completed = 0
+        self.failed_sends = 0
+        self.error = None
+        self.started = self.finished = None
+        self.scheduler = None
+        self.lines = deque(maxlen=LOG_LINES)
+        self.task = None
+        self.done = threading.Event()
+        self.on_log = None
+
+    def log(self, msg):
+        line = f"{datetime.now():%H:%M:%S} {msg}"
+        self.lines.append(line)
+        if self.on_log is not None:
+            self.on_log(self, msg)
+
+    def status(self):
+        s = self.scheduler
+        end = self.finished or time.time()
+        return {
+            "id": self.id, "name": self.name, "state": self.state, "step": self.label,
+            "completed_steps": self.completed, "steps": self.steps,
+            "progress": self.completed / self.steps if self.steps else 1.0,
+            "nominal_seconds": self.nominal_seconds,
+            "elapsed_seconds": end - self.started if self.started else 0.0,
+            "drift_ms": s.drift() * 1000 if s and self.state == "running" else None,
+            "max_lateness_ms": s.max_lateness * 1000 if s else 0.0,
+            "late_steps": s.late_steps if s else 0,
+            "failed_sends": self.failed_sends, "error": self.error,
+        }
+
+class RigService:
+    def __init__(self, send=send_dummy, timeout=COMMAND_TIMEOUT, checkpoint_dir=None, log=None):
+        self.send = send
+        self.timeout = timeout
+        self.checkpoint_dir = checkpoint_dir
+        self.log = log  # log(run, msg) for every run's log lines, e.g. to print them
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        self.runs = {}
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name="rig-service", daemon=True)
+
+    # --------------------------------------------------------------------------
+    # Service thread
+    # --------------------------------------------------------------------------
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        if self.checkpoint_dir:
+            self.loop.create_task(self._flush_checkpoints())
+        self.loop.run_forever()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        # Cancels whatever is still running (checkpoints are kept) and stops the loop
+        for run in self.active():
+            self.cancel(run.id)
+        self.wait(timeout=timeout)
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        self.thread.join(timeout)
+        self.loop.close()
+
+    async def _shutdown(self):
+        # Ends the flusher (and anything else left) before the loop stops
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.loop.stop()
+
+    async def _flush_checkpoints(self):
+        while True:
+            await asyncio.sleep(CHECKPOINT_INTERVAL)
+            running = [run for run in self.active() if run.checkpoint is not None]
+            if running:
+                await self.loop.run_in_executor(None, self._write_checkpoints, running)
+
+    def _write_checkpoints(self, runs):
+        for run in runs:
+            with run.checkpoint_lock:
+                if run.state == "running":
+                    run.checkpoint.write()
+
+    def _final_checkpoint(self, run):
+        # Runs in a worker thread as a run ends
+        with run.checkpoint_lock:
+            if run.state == "completed":
+                run.checkpoint.clear()
+            else:
+                run.checkpoint.write()
+
+    # --------------------------------------------------------------------------
+    # Runs (callable from any thread)
+    # --------------------------------------------------------------------------
+    def checkpoint_path(self, name):
+        # Run names become file names, so only plain slugs are allowed
+        if not isinstance(name, str) or not RUN_NAME.fullmatch(name) or ".." in name:
+            raise ValueError(f"invalid run name {name!r}: use letters, digits, '_', '-' and '.'")
+        if not self.checkpoint_dir:
+            return None
+        return os.path.join(self.checkpoint_dir, f"{name}.checkpoint.json")
+
+    def submit(self, name, sequence, resume=False, send=None):
+        # Starts a run of `sequence` (list of step dicts) and returns its id.
+        # Raises ValueError if the name or sequence is invalid, the name is
+        # taken by an active run, or there is no valid checkpoint to resume from.
+        path = self.checkpoint_path(name)
+        plan = compile_sequence(sequence)
+        checkpoint, start = None, None
+        if self.checkpoint_dir:
+            # update() only records the cursor (the flusher and the final
+            # write in _execute do all disk writes, off the loop thread)
+            checkpoint = Checkpoint(plan, path, interval=math.inf)
+            checkpoint.last_write = checkpoint.clock()
+        if resume:
+            if checkpoint is None:
+                raise ValueError("resuming needs a checkpoint directory")
+            data = load_checkpoint(checkpoint.path)
+            if data is None:
+                raise ValueError(f"no checkpoint for '{name}'")
+            try:
+                check_cursor(plan, data)
+            except KeyError as e:
+                raise ValueError(f"checkpoint for '{name}' is missing {e}")
+            start = (data["pc"], data["counters"], data["completed_steps"])
+
+        with self.lock:
+            if any(run.name == name for run in self.runs.values() if run.state in ACTIVE):
+                raise ValueError(f"a run named '{name}' is already active")
+            run = RigRun(next(self.ids), name, plan, send or self.send, checkpoint)
+            run.on_log = self.log
+            self.runs[run.id] = run
+        self.loop.call_soon_threadsafe(self._start, run, start)
+        return run.id
+
+    def _start(self, run, start):
+        run.task = self.loop.create_task(self._execute(run, start), name=f"rig-{run.name}")
+        run.task.add_done_callback(lambda task: self._never_started(run))
+
+    def _never_started(self, run):
+        # A task cancelled before its first step never enters _execute's
+        # try/finally, so the run is finished off here
+        if run.state == "pending":
+            run.state, run.finished = "cancelled", time.time()
+            run.log("=== Cancelled before starting ===")
+            run.done.set()
+
+    def cancel(self, run_id):
+        # Returns False if there is no such run or it has already finished
+        run = self.runs.get(run_id)
+        if run is None or run.state not in ACTIVE:
+            return False
+        # Queued behind _start, so the task exists by the time this runs
+        self.loop.call_soon_threadsafe(lambda: run.task.cancel())
+        return True
+
+    def run(self, run_id):
+        return self.runs.get(run_id)
+
+    def active(self):
+        with self.lock:
+            return [run for run in self.runs.values() if run.state in ACTIVE]
+
+    def status(self):
+        with self.lock:
+            runs = list(self.runs.values())
+        return [run.status() for run in runs]
+
+    def wait(self, run_ids=None, timeout=None):
+        # Waits for the given runs (default: all); returns True if all finished
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            runs = [self.runs[i] for i in run_ids] if run_ids is not None else list(self.runs.values())
+        for run in runs:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not run.done.wait(left):
+                return False
+        return True
+
+    def forget(self, run_id):
+        # Drops a finished run's status and log
+        with self.lock:
+            run = self.runs.get(run_id)
+            if run is not None and run.state not in ACTIVE:
+                del self.runs[run_id]
+                return True
+        return False
+
+    # --------------------------------------------------------------------------
+    # Executor
+    #
+    # Drives the same sequence_plan.PlanCursor as SequenceEngine.execute_plan,
+    # with each blocking wait replaced by an await.
+    # --------------------------------------------------------------------------
+    async def _execute(self, run, start):
+        args, labels = run.plan.args, run.plan.labels
+        scheduler = run.scheduler = DeadlineScheduler(time.monotonic, None)
+        checkpoint = run.checkpoint
+
+        run.state, run.started = "running", time.time()
+        run.completed = start[2] if start else 0
+        run.log(f"=== Resuming after {run.completed} completed steps ===" if start else "=== Running ===")
+        try:
+            cursor = PlanCursor(run.plan, start, checkpoint)
+            counters = cursor.counters
+            for event, pc in cursor.walk():
+                run.completed = cursor.completed
+                if event == EV_COMMAND or event == EV_DELAY:
+                    lateness = scheduler.begin_step()
+                    if lateness > scheduler.late_threshold:
+                        run.log(f"  (step started {lateness * 1000:.0f} ms late)")
+                    run.label = labels[pc]
+                    run.log(labels[pc])
+                    if event == EV_COMMAND:
+                        cmd, nodes = args[pc]
+                        results = await dispatch(cmd, nodes, run.send, self.timeout)
+                        for r in failures(results):
+                            run.log(f"  Command '{cmd}' failed on {r['node'] or 'all'}: {r['error']}")
+                            run.failed_sends += 1
+                        remaining = scheduler.advance(COMMAND_SLOT)
+                    else:
+                        remaining = scheduler.advance(args[pc])
+                    if remaining > 0:
+                        await asyncio.sleep(remaining)
+                elif event == EV_LOOP:
+                    run.log(labels[pc])
+                elif event == EV_ITERATION:
+                    run.log(labels[pc].format(counters[-1]))
+            run.completed = cursor.completed
+            run.state = "completed"
+            run.log(scheduler.summary())
+        except asyncio.CancelledError:
+            run.state = "cancelled"
+            run.log(f"=== Cancelled after {run.completed} completed steps ===")
+            raise
+        except Exception as e:
+            run.state, run.error = "failed", str(e) or type(e).__name__
+            run.log(f"=== Failed: {run.error} ===")
+        finally:
+            run.finished = time.time()
+            run.label = None
+            try:
+                if checkpoint is not None:
+                    await self.loop.run_in_executor(None, self._final_checkpoint, run)
+            finally:
+                run.done.set()
+
+# ------------------------------------------------------------------------------
+# HTTP
+# ------------------------------------------------------------------------------
+class RigHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _run_id(self, part):
+        try:
+            return int(part)
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if parts == ["runs"]:
+            self._send_json(self.service.status())
+        elif len(parts) == 2 and parts[0] == "runs":
+            run = self.service.run(self._run_id(parts[1]))
+            if run is None:
+                self._send_json({"error": f"no run '{parts[1]}'"}, 404)
+            else:
+                self._send_json({**run.status(), "log": list(run.lines)})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if parts == ["runs"]:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                _, sequence = read_sequence(body["file"])
+                name = body.get("name") or os.path.splitext(os.path.basename(body["file"]))[0]
+                run_id = self.service.submit(name, sequence.to_dicts(), bool(body.get("resume")))
+            except (KeyError, TypeError, OSError, ValueError) as e:
+                self._send_json({"error": str(e)}, 400)
+                return
+            self._send_json({"id": run_id}, 201)
+        elif len(parts) == 3 and parts[0] == "runs" and parts[2] == "cancel":
+            if self.service.cancel(self._run_id(parts[1])):
+                self._send_json({"cancelled": True})
+            else:
+                self._send_json({"error": f"no active run '{parts[1]}'"}, 404)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def log_message(self, format, *args):
+        pass  # status polling is too noisy to log
+
+def serve(service, host="127.0.0.1", port=8765):
+    handler = type("Handler", (RigHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# ------------------------------------------------------------------------------
+# Command line
+# ------------------------------------------------------------------------------
+def format_status(status):
+    progress = f"{status['completed_steps']}/{status['steps']}"
+    line = f"  #{status['id']:<3} {status['name']:<24} {status['state']:<9} {progress:>13}"
+    if status["failed_sends"]:
+        line += f"  {status['failed_sends']} failed sends"
+    if status["step"]:
+        line += f"  {status['step']}"
+    if status["error"]:
+        line += f"  {status['error']}"
+    return line
+
+def print_status(service):
+    statuses = service.status()
+    counts = {}
+    for s in statuses:
+        counts[s["state"]] = counts.get(s["state"], 0) + 1
+    print(f"{datetime.now():%H:%M:%S} " + ", ".join(f"{n} {state}" for state, n in counts.items()), flush=True)
+    for s in statuses:
+        print(format_status(s), flush=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run independent test sequences on many rigs in one process.")
+    parser.add_argument("sequences", nargs="*", help="sequence files to run, one rig each")
+    parser.add_argument("--copies", type=int, default=1, help="rigs per sequence file (load testing)")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="save each rig's cursor here so cancelled/interrupted runs can be resumed")
+    parser.add_argument("--resume", action="store_true", help="resume every rig from its checkpoint")
+    parser.add_argument("--serial", action="store_true",
+                        help="send over the nodes' COM ports instead of the dummy backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None,
+                        help="serve the HTTP status/cancel API on this port and keep running")
+    parser.add_argument("--status-interval", type=float, default=10.0, help="seconds between status tables")
+    parser.add_argument("--verbose", action="store_true", help="print every rig's log lines")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.sequences and args.port is None:
+        print("Nothing to do: give sequence files and/or --port.")
+        return 1
+
+    port_pool = None
+    send = send_dummy
+    if args.serial:
+        from port_pool import ConnectionPool
+        port_pool = ConnectionPool()
+        send = port_pool.send_command
+
+    log = (lambda run, msg: print(f"[{run.name}] {msg}", flush=True)) if args.verbose else None
+    service = RigService(send, checkpoint_dir=args.checkpoint_dir, log=log).start()
+    server = None
+    if args.port is not None:
+        server = serve(service, args.host, args.port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Rig service API on http://{args.host}:{args.port}/runs")
+
+    try:
+        for path in args.sequences:
+            _, sequence = read_sequence(path)
+            sequence = sequence.to_dicts()
+            stem = os.path.splitext(os.path.basename(path))[0]
+            for copy in range(1, args.copies + 1):
+                name = stem if args.copies == 1 else f"{stem}-{copy}"
+                service.submit(name, sequence, args.resume)
+        print(f"Started {len(service.runs)} rig(s)", flush=True)
+
+        if server is not None:
+            # Serve until interrupted; more runs can be submitted over HTTP
+            while True:
+                time.sleep(args.status_interval)
+                print_status(service)
+        while not service.wait(timeout=args.status_interval):
+            print_status(service)
+    except KeyboardInterrupt:
+        print("Interrupted; cancelling active runs"
+              + (f" (resume with --resume, checkpoints in {args.checkpoint_dir})" if args.checkpoint_dir else ""))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+    finally:
+        service.stop()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if port_pool is not None:
+            port_pool.close()
+
+    print_status(service)
+    ok = all(s["state"] == "completed" and not s["failed_sends"] for s in service.status())
+    return 0 if ok and service.runs else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
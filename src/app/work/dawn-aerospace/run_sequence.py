@@ -0,0 +1,82 @@
+import argparse
+import sys
+from datetime import datetime
+from checkpoint import CHECKPOINT_FILE
+from sequence_engine import DRY_RUN_TIMELINE_LINES, SequenceEngine
+from sequence_io import read_sequence
+
+# ------------------------------------------------------------------------------
+# Headless sequence runner
+#
+# Runs a saved test sequence (.seq / .seq.gz, or the JSON the GUI used to save,
+# e.g. ipaf.json) without the GUI, for rig controllers and CI agents:
+#
+#   python run_sequence.py ipaf.json                 run it
+#   python run_sequence.py ipaf.json --dry-run       nominal timing, nothing sent
+#   python run_sequence.py ipaf.json --validate      check it and exit
+#   python run_sequence.py ipaf.json --resume        continue an interrupted run
+#
+# Exit status: 0 on success, 1 if the sequence is invalid, can't be resumed or
+# had failed node sends, 130 if interrupted (the checkpoint is kept, so the run
+# can be resumed).
+# ------------------------------------------------------------------------------
+def log(msg):
+    print(f"{datetime.now():%H:%M:%S.%f}"[:-3] + f" {msg}", flush=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a test sequence without the GUI.")
+    parser.add_argument("sequence", help="sequence file (.seq, .seq.gz or .json)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--dry-run", action="store_true", help="log the nominal timeline; send nothing")
+    mode.add_argument("--validate", action="store_true", help="only check that the sequence compiles")
+    mode.add_argument("--resume", action="store_true", help="resume from the checkpoint of an interrupted run")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="checkpoint file")
+    parser.add_argument("--trace", default=None, help="write a Chrome trace of the run to this file")
+    parser.add_argument("--serial", action="store_true",
+                        help="send over the nodes' COM ports instead of the dummy backend")
+    parser.add_argument("--timeline-lines", type=int, default=DRY_RUN_TIMELINE_LINES,
+                        help="timeline lines shown by --dry-run")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        node_list, sequence = read_sequence(args.sequence)
+    except (OSError, ValueError) as e:
+        log(f"Error loading sequence: {e}")
+        return 1
+    sequence = sequence.to_dicts()
+    log(f"Loaded {args.sequence} ({len(node_list)} nodes)")
+    engine = SequenceEngine(log, checkpoint_path=args.checkpoint)
+
+    if args.validate:
+        plan = engine.compile(sequence)
+        if plan is not None:
+            log(f"Sequence is valid ({len(plan)} plan ops)")
+        return 0 if plan is not None else 1
+    if args.dry_run:
+        return 0 if engine.dry_run(sequence, args.timeline_lines) is not None else 1
+
+    port_pool = None
+    if args.serial:
+        # Imported here so the dummy backend doesn't pay for pyserial
+        from port_pool import ConnectionPool
+        port_pool = ConnectionPool()
+        engine.send_command = port_pool.send_command
+    try:
+        ok = engine.run(sequence, args.resume)
+    except KeyboardInterrupt:
+        log(f"Interrupted; resume with --resume (checkpoint {args.checkpoint})")
+        return 130
+    finally:
+        if port_pool is not None:
+            port_pool.close()
+        if args.trace and engine.tracer is not None:
+            engine.tracer.export_chrome_trace(args.trace)
+            log(f"Exported trace to {args.trace}")
+    if ok and engine.failed_sends:
+        log(f"{engine.failed_sends} node send(s) failed")
+    return 0 if ok and not engine.failed_sends else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import time
+
+# ------------------------------------------------------------------------------
+# Drift-free step scheduling
+#
+# Every timed step (command slot or delay) is planned against an absolute
+# deadline on the monotonic clock: deadline = run start + sum of the nominal
+# durations so far. Waiting sleeps only for whatever is left until that
+# deadline, so logging, dispatch and interpreter overhead are absorbed instead
+# of being added on top, and a step that overruns is caught up by the steps
+# after it. A 10,000-iteration loop therefore ends at its nominal time (plus
+# the overrun of the last step only), rather than drifting by the sum of all
+# overheads.
+#
+# Lateness is how far a step started after its planned start.
+# ------------------------------------------------------------------------------
+# Nominal time slot of one command step; the scheduler waits out whatever the
+# dispatch didn't use
+COMMAND_SLOT = 1.0
+
+class DeadlineScheduler:
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, late_threshold=0.05):
+        self.clock = clock
+        self.sleep = sleep
+        self.late_threshold = late_threshold
+        self.start()
+
+    def start(self):
+        self.origin = self.clock()
+        self.planned = 0.0  # nominal seconds from origin to the current deadline
+        self.steps = 0
+        self.late_steps = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def begin_step(self):
+        # Call as a timed step starts; returns its lateness in seconds
+        lateness = max(0.0, self.clock() - (self.origin + self.planned))
+        self.steps += 1
+        self.total_lateness += lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        if lateness > self.late_threshold:
+            self.late_steps += 1
+        return lateness
+
+    def advance(self, seconds):
+        # Extend the plan by `seconds`; returns the time left until that deadline
+        self.planned += seconds
+        return self.origin + self.planned - self.clock()
+
+    def wait(self, seconds):
+        # Extend the plan by `seconds` and sleep until that absolute deadline
+        remaining = self.advance(seconds)
+        if remaining > 0:
+            self.sleep(remaining)
+
+    def drift(self):
+        # Actual elapsed time minus nominal elapsed time
+        return self.clock() - (self.origin + self.planned)
+
+    def summary(self):
+        mean = self.total_lateness / self.steps if self.steps else 0.0
+        return (f"Schedule: {self.steps} timed steps, nominal {self.planned:.3f}s, "
+                f"drift {self.drift() * 1000:+.1f} ms, lateness mean {mean * 1000:.1f} ms / "
+                f"max {self.max_lateness * 1000:.1f} ms, {self.late_steps} late "
+                f"(> {self.late_threshold * 1000:.0f} ms)")
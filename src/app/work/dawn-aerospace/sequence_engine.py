@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from datetime import datetime
+from checkpoint import CHECKPOINT_FILE, Checkpoint, check_cursor, load_checkpoint
+from dry_run import estimate, format_duration, summary, timeline
+from scheduler import COMMAND_SLOT, DeadlineScheduler
+from sequence_plan import compile_sequence, open_loops, PlanCursor, EV_COMMAND, EV_DELAY, EV_LOOP, EV_ITERATION
+from tracing import Tracer
+
+# ------------------------------------------------------------------------------
+# Sequence engine
+#
+# Validates, dry-runs and executes test sequences (lists of command / delay /
+# loop dicts) with no GUI: everything it reports goes through log(msg), which
+# the Tk app points at its log pipeline and run_sequence.py at stdout. Nothing
+# here imports tkinter. asyncio (for command dispatch) is only imported once a
+# run starts and numpy once a telemetry capture starts, so validating or dry
+# running a sequence from the command line starts quickly.
+#
+# Everything a run drives (its event loop, scheduler, tracer and cursor) is
+# local to its execute_plan call (see EngineRun), not kept on the engine, and
+# run() refuses to start while another run of the same engine is in progress,
+# so a second Run/Resume can't take over a running sequence's state.
+# ------------------------------------------------------------------------------
+DRY_RUN_TIMELINE_LINES = 200  # timeline lines logged by a dry run
+
+# Telemetry captured between run_tlm_src and stop_tlm_src
+TLM_DIR = "telemetry"
+TLM_RATE = 10.0             # samples per second per channel (dummy source)
+TLM_HISTORY_SECONDS = 3600  # ring length per channel, in source samples
+
+class EngineRun:
+    # Per-run state of SequenceEngine.execute_plan
+    __slots__ = ("dispatch_loop", "scheduler", "cursor", "tracer", "failed_sends")
+
+    def __init__(self, dispatch_loop, scheduler, cursor, tracer=None):
+        self.dispatch_loop = dispatch_loop
+        self.scheduler = scheduler
+        self.cursor = cursor
+        self.tracer = tracer
+        self.failed_sends = 0
+
+class SequenceEngine:
+    # Per-node command backend and timeout used by handle_command; None means
+    # node_dispatch's send_dummy / COMMAND_TIMEOUT
+    send_command = None
+    command_timeout = None
+    # Span/latency recorder of the latest run (for export); None if untraced
+    tracer = None
+    # Running telemetry capture (see start_tlm_capture), if any
+    tlm_capture = None
+    # Node sends that failed or timed out in the latest run
+    failed_sends = 0
+
+    def __init__(self, log=print, checkpoint_path=CHECKPOINT_FILE, tlm_dir=TLM_DIR):
+        self.log = log
+        self.checkpoint_path = checkpoint_path
+        self.tlm_dir = tlm_dir
+        self.run_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.run_lock.locked()
+
+    def compile(self, sequence):
+        # The sequence's plan, or None (logged) if it is invalid
+        try:
+            return compile_sequence(sequence)
+        except ValueError as e:
+            self.log(f"Invalid test sequence: {e}")
+            return None
+
+    def run(self, sequence, resume=False):
+        # Runs a whole sequence, from its checkpoint if resume is set. Returns
+        # True if it ran to the end; False (logged) if it couldn't start,
+        # including while another run is in progress.
+        if not self.run_lock.acquire(blocking=False):
+            self.log("A test suite is already running.")
+            return False
+        try:
+            return self._run(sequence, resume)
+        finally:
+            self.run_lock.release()
+
+    def _run(self, sequence, resume):
+        self.log("=== Resuming Test Suite ===" if resume else "=== Running Test Suite ===")
+        plan = self.compile(sequence)
+        if plan is None:
+            return False
+
+        start = None
+        if resume:
+            try:
+                data = load_checkpoint(self.checkpoint_path)
+                if data is None:
+                    self.log("No checkpoint to resume from.")
+                    return False
+                check_cursor(plan, data)
+            except (ValueError, KeyError) as e:
+                self.log(f"Cannot resume: {e}")
+                return False
+            start = (data["pc"], data["counters"], data["completed_steps"])
+            where = " > ".join(f"{c}/{plan.args[k][0]}" for c, k in
+                               zip(data["counters"], open_loops(plan, data["pc"])))
+            self.log(f"Resuming after {data['completed_steps']} completed steps"
+                     + (f" (loop iterations {where})" if where else ""))
+
+        # A fresh run overwrites any previous checkpoint
+        tracer = self.tracer = Tracer(time.perf_counter)
+        try:
+            self.execute_plan(plan, Checkpoint(plan, self.checkpoint_path), start, tracer)
+        finally:
+            for line in tracer.summary():
+                self.log(f"  {line}")
+            if self.tlm_capture is not None:
+                self.log("Sequence ended without stop_tlm_src.")
+                self.stop_tlm_capture()
+        self.log("=== Test Suite Complete ===")
+        return True
+
+    def dry_run(self, sequence, timeline_lines=DRY_RUN_TIMELINE_LINES):
+        # Validate and cost the sequence on a virtual clock: nothing is sent
+        self.log("=== Dry Run ===")
+        plan = self.compile(sequence)
+        if plan is None:
+            return None
+        totals = estimate(plan)
+        for line in summary(totals):
+            self.log(line)
+
+        shown = 0
+        for t, label in timeline(plan):
+            if shown == timeline_lines:
+                self.log(f"  ... timeline truncated after {shown} lines")
+                break
+            self.log(f"[+{format_duration(t)}] {label}")
+            shown += 1
+        self.log("=== Dry Run Complete ===")
+        return totals
+
+    def execute_block(self, block):
+        self.execute_plan(compile_sequence(block))
+
+    def execute_plan(self, plan, checkpoint=None, start=None, tracer=None):
+        # Drives a PlanCursor (see sequence_plan): it walks loops and keeps the
+        # (pc, counters) cursor, resuming from `start` and recording it in
+        # `checkpoint` after every timed step; this only acts on its events.
+        args, labels = plan.args, plan.labels
+        cursor = PlanCursor(plan, start, checkpoint)
+        counters = cursor.counters
+
+        # Command fan-out runs on an event loop owned by the executing thread;
+        # timed steps are planned against absolute monotonic deadlines
+        import asyncio
+        run = EngineRun(asyncio.new_event_loop(), DeadlineScheduler(time.monotonic, time.sleep), cursor, tracer)
+
+        # Loop iteration start times, parallel to counters (only when tracing)
+        if tracer is not None:
+            run_start = tracer.now()
+            iteration_starts = [run_start] * len(counters)
+        try:
+            for event, pc in cursor.walk():
+                if event == EV_COMMAND:
+                    self.handle_command(run, args[pc], labels[pc])
+                elif event == EV_DELAY:
+                    self.handle_delay(run, args[pc], labels[pc])
+                elif event == EV_LOOP:
+                    self.log(labels[pc])
+                elif event == EV_ITERATION:
+                    self.log(labels[pc].format(counters[-1]))
+                    if tracer is not None and counters[-1] == 1:
+                        iteration_starts.append(tracer.now())
+                elif tracer is not None:
+                    count = args[args[pc]][0]
+                    self.trace_loop_iteration(tracer, pc, counters[-1], count, iteration_starts)
+                    if counters[-1] == count:
+                        iteration_starts.pop()
+            self.log(run.scheduler.summary())
+        finally:
+            self.failed_sends = run.failed_sends
+            if tracer is not None:
+                tracer.span("run", "run", run_start, tracer.now(), key="run")
+            # A dispatch interrupted by Ctrl+C leaves its node sends pending
+            pending = asyncio.all_tasks(run.dispatch_loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                run.dispatch_loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            run.dispatch_loop.close()
+            if checkpoint is not None:
+                if cursor.finished:
+                    checkpoint.clear()
+                else:
+                    checkpoint.write()
+
+    def _check_lateness(self, run):
+        lateness = run.scheduler.begin_step()
+        if lateness > run.scheduler.late_threshold:
+            self.log(f"  (step started {lateness * 1000:.0f} ms late)")
+        if run.tracer is not None:
+            run.tracer.record("scheduler:lateness", lateness)
+
+    def trace_loop_iteration(self, tracer, end_pc, iteration, count, iteration_starts):
+        # Called at a loop's END_LOOP: closes the span of the iteration that just
+        # finished and starts timing the next one
+        now = tracer.now()
+        tracer.span(f"loop iteration {iteration}/{count}", "loop", iteration_starts[-1], now,
+                         args={"end_pc": end_pc}, key="loop:iteration")
+        iteration_starts[-1] = now
+
+    def _tag_step(self, run, label):
+        # Samples captured from here on belong to this step
+        if self.tlm_capture is not None:
+            self.tlm_capture.set_step(run.scheduler.steps, label)
+
+    def start_tlm_capture(self, node):
+        # Dummy telemetry source (the demografana signals, live) recorded into
+        # ring files under tlm_dir; imported here as only captures need numpy
+        from telemetry_server import LiveSource, live_sheets
+        from tlm_capture import TelemetryCapture
+
+        self.stop_tlm_capture()
+        name = node["name"] if node else "all"
+        directory = os.path.join(self.tlm_dir, f"{datetime.now():%Y%m%d_%H%M%S}_{name}")
+        source = LiveSource(live_sheets(node["scid"] if node else 0, TLM_RATE), TLM_RATE)
+        source.start()
+        self.tlm_capture = TelemetryCapture(source, directory, TLM_HISTORY_SECONDS).start()
+        self.log(f"  Capturing telemetry from {name} to {directory}")
+
+    def stop_tlm_capture(self):
+        capture, self.tlm_capture = self.tlm_capture, None
+        if capture is None:
+            return
+        capture.source.stop()
+        capture.stop()
+        self.log(f"  Telemetry capture stopped ({capture.directory}, {capture.dropped} samples dropped)")
+
+    def handle_command(self, run, arg, label):
+        # Sent to all target nodes concurrently; the step takes as long as the
+        # slowest node (bounded by command_timeout)
+        from node_dispatch import COMMAND_TIMEOUT, dispatch, failures, send_dummy
+
+        cmd, nodes = arg
+        tracer = run.tracer
+        if tracer is not None:
+            t0 = tracer.now()
+        self._check_lateness(run)
+        self._tag_step(run, label)
+        self.log(label)
+        results = run.dispatch_loop.run_until_complete(
+            dispatch(cmd, nodes, self.send_command or send_dummy, self.command_timeout or COMMAND_TIMEOUT))
+        for r in failures(results):
+            self.log(f"  Command '{cmd}' failed on {r['node'] or 'all'}: {r['error']}")
+            run.failed_sends += 1
+        if cmd == "run_tlm_src" and not failures(results):
+            self.start_tlm_capture(nodes[0] if nodes else None)
+        elif cmd == "stop_tlm_src":
+            self.stop_tlm_capture()
+        if tracer is not None:
+            t1 = tracer.now()
+            # All nodes are sent to at t0; each span lasts as long as its reply took
+            for r in results:
+                track = f"node:{r['node'] or 'all'}"
+                tracer.span(cmd, "node", t0, t0 + r["seconds"], track,
+                            None if r["ok"] else {"error": r["error"]}, key=track)
+        run.scheduler.wait(COMMAND_SLOT)
+        if tracer is not None:
+            tracer.record(f"command:{cmd}", t1 - t0)
+            tracer.span(cmd, "command", t0, tracer.now(), args={"dispatch_ms": (t1 - t0) * 1000},
+                        key="step:command")
+        return results
+
+    def handle_delay(self, run, secs, label):
+        tracer = run.tracer
+        if tracer is not None:
+            t0 = tracer.now()
+        self._check_lateness(run)
+        self._tag_step(run, label)
+        self.log(label)
+        run.scheduler.wait(secs)
+        if tracer is not None:
+            tracer.span(f"delay {secs}s", "delay", t0, tracer.now(), key="step:delay")
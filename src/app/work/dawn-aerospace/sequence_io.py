@@ -0,0 +1,160 @@
+import gzip
+import json
+
+from sequence_model import Command, Delay, Loop, Sequence
+
+# ------------------------------------------------------------------------------
+# Sequence files
+#
+# Version 2 is JSON Lines: a header line, then one compact record per step in
+# execution order, so a file can be read and built one step at a time instead of
+# json.load-ing it whole. Nodes are stored once in the header and commands refer
+# to them by index, rather than embedding a copy of every node in every command.
+#
+#   {"format": "dawn-test-sequence", "version": 2, "nodes": [...], "listed": n}
+#   ["c", command, [node ids]]    command
+#   ["d", seconds]                delay
+#   ["l", count]                  start of a loop; its steps follow...
+#   ["e"]                         ...up to the matching end of loop
+#
+# The first `listed` nodes are the node list; any others are only referenced by
+# commands (e.g. a node deleted after the command was added).
+#
+# Files are gzip-compressed when the name ends in .gz; compression is detected
+# from the content on load. The original format (one indented JSON object with
+# node_list and test_sequence) still loads.
+# ------------------------------------------------------------------------------
+FORMAT = "dawn-test-sequence"
+VERSION = 2
+GZIP_MAGIC = b"\x1f\x8b"
+PROGRESS_EVERY = 10000  # steps between progress callbacks while loading
+
+def _open_text(path, mode):
+    if "r" in mode:
+        with open(path, "rb") as f:
+            compressed = f.read(2) == GZIP_MAGIC
+    else:
+        compressed = path.endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+def _node_key(node):
+    return (node.get("name"), node.get("scid"), node.get("com"))
+
+def _walk(steps):
+    # (kind, step) in execution order, with ("end", None) after each loop's tasks
+    stack = [iter(steps)]
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            if stack:
+                yield "end", None
+            continue
+        yield step.kind, step
+        if step.kind == "loop":
+            stack.append(iter(step.tasks))
+
+def write_sequence(path, node_list, sequence):
+    nodes, ids = [], {}
+
+    def node_id(node):
+        key = _node_key(node)
+        i = ids.get(key)
+        if i is None:
+            i = ids[key] = len(nodes)
+            nodes.append(node)
+        return i
+
+    for node in node_list:
+        node_id(node)
+    listed = len(nodes)
+    for kind, step in _walk(sequence):
+        if kind == "command":
+            for node in step.nodes:
+                node_id(node)
+
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    with _open_text(path, "w") as f:
+        f.write(dumps({"format": FORMAT, "version": VERSION, "nodes": nodes, "listed": listed}) + "\n")
+        for kind, step in _walk(sequence):
+            if kind == "command":
+                record = ["c", step.command, [ids[_node_key(n)] for n in step.nodes]]
+            elif kind == "delay":
+                record = ["d", step.seconds]
+            elif kind == "loop":
+                record = ["l", step.count]
+            else:
+                record = ["e"]
+            f.write(dumps(record) + "\n")
+
+def _read_records(f, header, path, progress):
+    nodes = header.get("nodes", [])
+    listed = header.get("listed", len(nodes))
+    sequence = Sequence()
+    parents = [None]  # None = top level
+    count = 0
+    decode = json.JSONDecoder().decode
+
+    for lineno, line in enumerate(f, start=2):
+        if not line.strip():
+            continue
+        try:
+            record = decode(line)
+        except ValueError as e:
+            raise ValueError(f"{path}:{lineno}: invalid JSON ({e})")
+        tag = record[0] if isinstance(record, list) and record else None
+        try:
+            if tag == "c":
+                for i in record[2]:
+                    # Python would happily take -1 as the last node
+                    if type(i) is not int or not 0 <= i < len(nodes):
+                        raise ValueError(f"unknown node id {i!r} in {record!r}")
+                step = Command(record[1], [nodes[i] for i in record[2]])
+            elif tag == "d":
+                step = Delay(record[1])
+            elif tag == "l":
+                step = Loop(record[1])
+            elif tag == "e":
+                if len(parents) == 1:
+                    raise ValueError("end of loop without a loop")
+                parents.pop()
+                continue
+            else:
+                raise ValueError(f"unknown record {record!r}")
+        except (IndexError, TypeError) as e:
+            raise ValueError(f"{path}:{lineno}: malformed record {record!r} ({e})")
+        except ValueError as e:
+            raise ValueError(f"{path}:{lineno}: {e}")
+
+        sequence.add(step, parents[-1])
+        if tag == "l":
+            parents.append(step)
+        count += 1
+        if progress is not None and count % PROGRESS_EVERY == 0:
+            progress(count)
+
+    if len(parents) != 1:
+        raise ValueError(f"{path}: {len(parents) - 1} loop(s) not closed")
+    return nodes[:listed], sequence
+
+def read_sequence(path, progress=None):
+    # Returns (node_list, Sequence). Safe to call off the Tk thread: it touches
+    # no GUI state. progress(n) is called every PROGRESS_EVERY steps.
+    with _open_text(path, "r") as f:
+        first = f.readline()
+        try:
+            header = json.loads(first)
+        except ValueError:
+            header = None
+
+        if isinstance(header, dict) and header.get("format") == FORMAT:
+            if header.get("version", 0) > VERSION:
+                raise ValueError(f"{path}: format version {header['version']} is newer than "
+                                 f"this tool supports ({VERSION})")
+            return _read_records(f, header, path, progress)
+
+        # Original single-object JSON format
+        data = json.loads(first + f.read())
+    return data.get("node_list", []), Sequence.from_dicts(data.get("test_sequence", []))
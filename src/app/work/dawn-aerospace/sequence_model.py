@@ -0,0 +1,255 @@
+# ------------------------------------------------------------------------------
+# Identity-indexed test sequence model
+#
+# Steps are small __slots__ objects with a stable integer id, a parent pointer
+# (the enclosing Loop, or the sequence's root loop) and, for loops, a list of
+# child steps. The Sequence keeps an id -> step index and a cached position of
+# every step within its parent, so edits driven by a selection (look up, move
+# by one, delete, wrap) never scan the sequence or compare steps by value: two
+# steps with identical content are still different steps.
+#
+# Positions are cached per parent, together with the first position in it that
+# may be out of date. Appending or swapping neighbours updates positions in
+# place (O(1)). Inserting, deleting or wrapping at position k only invalidates
+# positions from k on; the next index() of a step past k rebuilds them, while
+# steps before k are still looked up in O(1). These edits are therefore NOT
+# O(1) or O(log n): each is O(len(parent.tasks) - k) in Python on the next
+# lookup, plus the list's own O(len) shift in C, so they are cheap near the
+# end of a parent and O(n) near its start. Bulk deletes filter each affected
+# parent once, so deleting k steps is O(n), not O(n * k).
+#
+# The on-disk / executor form is still the plain dict layout
+# ({"type": "command", ...}); see to_dicts() / from_dicts().
+# ------------------------------------------------------------------------------
+class Step:
+    __slots__ = ("id", "parent")
+    kind = None
+
+    def __init__(self):
+        self.id = None
+        self.parent = None
+
+class Command(Step):
+    __slots__ = ("command", "nodes")
+    kind = "command"
+
+    def __init__(self, command, nodes=()):
+        super().__init__()
+        self.command = command
+        self.nodes = list(nodes)
+
+    def to_dict(self):
+        return {"type": "command", "command": self.command, "nodes": list(self.nodes)}
+
+class Delay(Step):
+    __slots__ = ("seconds",)
+    kind = "delay"
+
+    def __init__(self, seconds):
+        super().__init__()
+        self.seconds = seconds
+
+    def to_dict(self):
+        return {"type": "delay", "seconds": self.seconds}
+
+class Loop(Step):
+    __slots__ = ("count", "tasks")
+    kind = "loop"
+
+    def __init__(self, count, tasks=()):
+        super().__init__()
+        self.count = count
+        self.tasks = list(tasks)
+
+    def to_dict(self):
+        return {"type": "loop", "count": self.count, "tasks": [t.to_dict() for t in self.tasks]}
+
+def step_from_dict(item):
+    # Unknown or malformed steps are rejected here; value checks (e.g. negative
+    # delays) are left to compile_sequence, as before
+    kind = item.get("type") if isinstance(item, dict) else None
+    if kind == "command":
+        return Command(item.get("command"), item.get("nodes", []))
+    if kind == "delay":
+        return Delay(item.get("seconds"))
+    if kind == "loop":
+        return Loop(item.get("count"), [step_from_dict(t) for t in item.get("tasks", [])])
+    raise ValueError(f"Unknown step type {kind!r}")
+
+class Sequence:
+    ROOT = 0
+
+    def __init__(self, steps=()):
+        self.root = Loop(1)
+        self.root.id = self.ROOT
+        self.steps = {self.ROOT: self.root}
+        self._next_id = self.ROOT + 1
+        self._pos = {}
+        self._stale = {}  # parent id -> first position whose cached value may be wrong
+        for step in steps:
+            self.add(step)
+
+    @classmethod
+    def from_dicts(cls, items):
+        return cls(step_from_dict(item) for item in items)
+
+    def to_dicts(self):
+        return [step.to_dict() for step in self.root.tasks]
+
+    def __len__(self):
+        # Number of steps, at any depth
+        return len(self.steps) - 1
+
+    def __iter__(self):
+        return iter(self.root.tasks)
+
+    def __getitem__(self, step_id):
+        return self.steps[step_id]
+
+    # --------------------------------------------------------------------------
+    # Index maintenance
+    # --------------------------------------------------------------------------
+    def _register(self, step, parent):
+        # Give a step (and any steps inside it) ids and parent pointers
+        stack = [(step, parent)]
+        while stack:
+            s, p = stack.pop()
+            if s.id is not None and self.steps.get(s.id) is s:
+                raise ValueError(f"Step {s.id} is already in the sequence")
+            s.id = self._next_id
+            self._next_id += 1
+            s.parent = p
+            self.steps[s.id] = s
+            if s.kind == "loop":
+                self._stale[s.id] = 0
+                stack.extend((child, s) for child in reversed(s.tasks))
+
+    def _forget(self, step):
+        stack = [step]
+        while stack:
+            s = stack.pop()
+            self.steps.pop(s.id, None)
+            self._pos.pop(s.id, None)
+            self._stale.pop(s.id, None)
+            if s.kind == "loop":
+                stack.extend(s.tasks)
+
+    def _invalidate(self, parent, start):
+        # Positions from `start` on may have shifted
+        self._stale[parent.id] = min(start, self._stale.get(parent.id, start))
+
+    def _reindex(self, parent, start=0):
+        tasks = parent.tasks
+        for i in range(start, len(tasks)):
+            self._pos[tasks[i].id] = i
+        self._stale.pop(parent.id, None)
+
+    def index(self, step):
+        # Position of a step within its parent's tasks. Cached positions below
+        # the parent's first stale one are still right.
+        pos = self._pos.get(step.id)
+        start = self._stale.get(step.parent.id)
+        if start is not None and (pos is None or pos >= start):
+            self._reindex(step.parent, start)
+            pos = self._pos[step.id]
+        return pos
+
+    def ancestors(self, step):
+        parent = step.parent
+        while parent is not self.root:
+            yield parent
+            parent = parent.parent
+
+    # --------------------------------------------------------------------------
+    # Editing
+    # --------------------------------------------------------------------------
+    def add(self, step, parent=None, index=None):
+        # Insert a new step into `parent` (a Loop, default top level) at `index`
+        # (default: the end). Returns the step, now with an id.
+        parent = self.root if parent is None else parent
+        if parent.kind != "loop":
+            raise ValueError("Steps can only be added to a loop or the top level")
+        self._register(step, parent)
+        tasks = parent.tasks
+        if index is None or index >= len(tasks):
+            tasks.append(step)
+            self._pos[step.id] = len(tasks) - 1
+        else:
+            index = max(0, index)
+            tasks.insert(index, step)
+            self._invalidate(parent, index)
+        return step
+
+    def swap(self, step, offset):
+        # Move a step by `offset` places within its parent by swapping with the
+        # step there. Returns the new index, or None if that would leave the list.
+        tasks = step.parent.tasks
+        i = self.index(step)
+        j = i + offset
+        if j < 0 or j >= len(tasks):
+            return None
+        other = tasks[j]
+        tasks[i], tasks[j] = other, step
+        self._pos[step.id], self._pos[other.id] = j, i
+        return j
+
+    def top_level_only(self, steps):
+        # Drop steps that are inside another of the given steps
+        chosen = {s.id for s in steps}
+        return [s for s in steps if not any(a.id in chosen for a in self.ancestors(s))]
+
+    def remove(self, steps):
+        # Delete steps (and everything inside them). Returns the removed steps
+        # including descendants, e.g. to drop their tree items.
+        steps = self.top_level_only(steps)
+        by_parent = {}
+        for step in steps:
+            by_parent.setdefault(step.parent.id, set()).add(step.id)
+
+        for parent_id, ids in by_parent.items():
+            parent = self.steps[parent_id]
+            first = min(self.index(self.steps[i]) for i in ids)
+            if len(ids) == 1:
+                del parent.tasks[first]
+            else:
+                parent.tasks = [s for s in parent.tasks if s.id not in ids]
+            self._invalidate(parent, first)
+
+        removed = []
+        for step in steps:
+            stack = [step]
+            while stack:
+                s = stack.pop()
+                removed.append(s)
+                if s.kind == "loop":
+                    stack.extend(s.tasks)
+            self._forget(step)
+        return removed
+
+    def wrap(self, steps, count):
+        # Replace sibling steps with a new Loop holding them, in sequence order.
+        # The loop takes the place of the first of them. Returns the loop.
+        if not steps:
+            raise ValueError("Nothing to wrap")
+        parent = steps[0].parent
+        if any(s.parent is not parent for s in steps):
+            raise ValueError("Steps to wrap must share the same parent")
+
+        steps = sorted(steps, key=self.index)
+        first = self.index(steps[0])
+        ids = {s.id for s in steps}
+
+        loop = Loop(count)
+        loop.id = self._next_id
+        self._next_id += 1
+        loop.parent = parent
+        loop.tasks = steps
+        self.steps[loop.id] = loop
+        for i, s in enumerate(steps):
+            s.parent = loop
+            self._pos[s.id] = i
+
+        parent.tasks = [s for s in parent.tasks if s.id not in ids]
+        parent.tasks.insert(first, loop)
+        self._invalidate(parent, first)
+        return loop
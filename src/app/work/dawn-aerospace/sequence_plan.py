@@ -0,0 +1,166 @@
+import math
+
+# ------------------------------------------------------------------------------
+# Flat execution plans for test sequences
+#
+# compile_sequence() validates a test_sequence (nested command/delay/loop dicts)
+# once and lowers it to a flat list of opcodes. Loops become a LOOP/END_LOOP
+# pair that jump to each other, so running a plan needs no recursion, no string
+# type dispatch and no dict lookups, and every log label is built up front.
+#
+#   OP_COMMAND   arg = (command, nodes)    label = log line
+#   OP_DELAY     arg = seconds             label = log line
+#   OP_LOOP      arg = (count, end_pc)     label = log line
+#   OP_END_LOOP  arg = loop_pc             label = iteration line template
+# ------------------------------------------------------------------------------
+OP_COMMAND, OP_DELAY, OP_LOOP, OP_END_LOOP = range(4)
+
+class Plan:
+    __slots__ = ("ops", "args", "labels")
+
+    def __init__(self):
+        self.ops = []
+        self.args = []
+        self.labels = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def emit(self, op, arg, label):
+        self.ops.append(op)
+        self.args.append(arg)
+        self.labels.append(label)
+        return len(self.ops) - 1
+
+def _compile_block(plan, block, path):
+    if not isinstance(block, list):
+        raise ValueError(f"{path}: expected a list of steps")
+
+    for k, item in enumerate(block):
+        where = f"{path}[{k}]"
+        if not isinstance(item, dict):
+            raise ValueError(f"{where}: expected an object, got {type(item).__name__}")
+        kind = item.get("type")
+
+        if kind == "command":
+            cmd = item.get("command")
+            nodes = item.get("nodes", [])
+            if not isinstance(cmd, str) or not cmd:
+                raise ValueError(f"{where}: command must be a non-empty string")
+            if not isinstance(nodes, list) or not all(isinstance(n, dict) and "name" in n for n in nodes):
+                raise ValueError(f"{where}: nodes must be a list of nodes with a name")
+            node_names = ", ".join([n["name"] for n in nodes]) if nodes else "None"
+            plan.emit(OP_COMMAND, (cmd, tuple(nodes)),
+                      f"Executing command '{cmd}' on nodes: {node_names} (dummy).")
+
+        elif kind == "delay":
+            secs = item.get("seconds")
+            if isinstance(secs, bool) or not isinstance(secs, (int, float)) or not math.isfinite(secs) or secs < 0:
+                raise ValueError(f"{where}: seconds must be a finite non-negative number")
+            plan.emit(OP_DELAY, secs, f"Delaying for {secs} seconds (dummy)...")
+
+        elif kind == "loop":
+            count = item.get("count")
+            if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+                raise ValueError(f"{where}: count must be a non-negative integer")
+            begin = plan.emit(OP_LOOP, None, f"Starting loop, repeating {count} times (dummy)...")
+            _compile_block(plan, item.get("tasks", []), f"{where}.tasks")
+            end = plan.emit(OP_END_LOOP, begin, f"  Loop iteration {{}}/{count}")
+            plan.args[begin] = (count, end)
+
+        else:
+            raise ValueError(f"{where}: unknown step type {kind!r}")
+
+def compile_sequence(sequence):
+    plan = Plan()
+    _compile_block(plan, sequence, "test_sequence")
+    return plan
+
+# ------------------------------------------------------------------------------
+# Walking a plan
+#
+# PlanCursor is the one interpreter of a plan's control flow, shared by
+# SequenceEngine (blocking), the rig service (asyncio) and dry runs (virtual
+# clock). Its position is (pc, counters): the pc of the next op and the
+# iteration counters of the loops open there, outermost first, plus the number
+# of timed steps completed. walk() yields what the executor has to do, in order:
+#
+#   EV_COMMAND / EV_DELAY   run the step at pc; the cursor moves past it (and
+#                           the checkpoint, if any, is updated) on resuming
+#   EV_LOOP                 the loop at pc is entered (count may be 0)
+#   EV_ITERATION            iteration counters[-1] of the loop whose END_LOOP
+#                           is at pc starts
+#   EV_END_ITERATION        that iteration just finished
+#
+# Executors only act on events (send, sleep, log, trace); jumps, counters and
+# resume checks live here.
+# ------------------------------------------------------------------------------
+EV_COMMAND, EV_DELAY, EV_LOOP, EV_ITERATION, EV_END_ITERATION = range(5)
+
+def open_loops(plan, pc):
+    # pcs of the OP_LOOPs enclosing pc, outermost first
+    return [k for k in range(pc) if plan.ops[k] == OP_LOOP and plan.args[k][1] >= pc]
+
+def check_position(plan, pc, counters):
+    # Raise ValueError unless (pc, counters) is a position in `plan`
+    if isinstance(pc, bool) or not isinstance(pc, int) or not 0 <= pc <= len(plan):
+        raise ValueError("cursor is out of range")
+    # One counter per loop that is open at pc, each within that loop's count
+    loops = open_loops(plan, pc)
+    if not isinstance(counters, list) or len(counters) != len(loops) or not all(
+            isinstance(c, int) and 1 <= c <= plan.args[k][0] for c, k in zip(counters, loops)):
+        raise ValueError("loop counters don't match the sequence")
+
+class PlanCursor:
+    def __init__(self, plan, start=None, checkpoint=None):
+        # start = (pc, counters, completed) to resume from; checkpoint (see
+        # checkpoint.Checkpoint) is updated after every timed step
+        pc, counters, completed = start if start else (0, [], 0)
+        counters = list(counters)
+        if start:
+            check_position(plan, pc, counters)
+        self.plan = plan
+        self.pc = pc
+        self.counters = counters
+        self.completed = completed
+        self.checkpoint = checkpoint
+        if checkpoint is not None:
+            checkpoint.update(pc, counters, completed)
+
+    @property
+    def finished(self):
+        return self.pc >= len(self.plan.ops)
+
+    def walk(self):
+        ops, args = self.plan.ops, self.plan.args
+        counters, checkpoint = self.counters, self.checkpoint
+        pc, end = self.pc, len(ops)
+        while pc < end:
+            op = ops[pc]
+            if op == OP_COMMAND or op == OP_DELAY:
+                yield (EV_COMMAND if op == OP_COMMAND else EV_DELAY), pc
+                pc += 1
+                self.pc = pc
+                self.completed += 1
+                if checkpoint is not None:
+                    checkpoint.update(pc, counters, self.completed)
+            elif op == OP_LOOP:
+                count, loop_end = args[pc]
+                yield EV_LOOP, pc
+                pc = pc + 1 if count else loop_end + 1
+                self.pc = pc
+                if count:
+                    counters.append(1)
+                    yield EV_ITERATION, loop_end
+            else:
+                loop_pc = args[pc]
+                yield EV_END_ITERATION, pc
+                if counters[-1] < args[loop_pc][0]:
+                    counters[-1] += 1
+                    self.pc = loop_pc + 1
+                    yield EV_ITERATION, pc
+                    pc = loop_pc + 1
+                else:
+                    counters.pop()
+                    pc += 1
+                    self.pc = pc
@@ -0,0 +1,392 @@
+import argparse
+import time
+import numpy as np
+
+# ------------------------------------------------------------------------------
+# Streaming spike detection for thruster channels
+#
+# Each channel keeps a few numbers: a Holt forecast (level + trend, so the
+# thruster ramps aren't anomalies), an exponentially weighted mean absolute
+# forecast residual, and a sample count. A sample is flagged when
+#
+#   |x - forecast| > k * mean |residual| + max(abs_floor, rel_floor * |forecast|)
+#
+# The first `warmup` samples only seed the baseline, robustly (medians), so a
+# spike among them doesn't skew it. After that the baseline is frozen while
+# samples are flagged (it keeps following its trend), so a spike neither drags
+# the level nor widens the threshold. Unflagged residuals beyond clip * threshold
+# are clipped before they update it, so spikes too small to flag (e.g. while a
+# ramp crosses the spike value) can't slowly widen the threshold either.
+# Consecutive flagged samples form one event. An excursion lasting max_event
+# seconds is a level shift rather than a spike: the event is closed and the
+# baseline re-seeded. NaN samples (dropouts) are skipped.
+#
+# Two ways to feed a detector, with the same results:
+#   - sample by sample (_step), for small live blocks;
+#   - vectorized (_run), for whole sheets: between events the unfrozen filter
+#     is a linear recurrence, evaluated for a whole stretch at once as a
+#     blocked scan (LinearScan); only flagged or clipped samples and the
+#     events they start are stepped one by one.
+# ------------------------------------------------------------------------------
+K = 8.0            # residual threshold, in rolling mean absolute residuals...
+REL_FLOOR = 0.05   # ...plus this fraction of the forecast
+ABS_FLOOR = 0.05   # ...and at least this much (covers 2-decimal rounding)
+ALPHA = 0.05       # level smoothing
+BETA = 0.1         # trend smoothing, as a fraction of the level correction
+GAMMA = 0.02       # mean absolute residual smoothing
+CLIP = 0.5         # unflagged residuals are clipped to this fraction of the threshold
+WARMUP = 10        # samples that only seed the baseline
+MAX_EVENT = 5.0    # seconds after which an excursion counts as a level shift
+SCAN_MIN = 64      # blocks at least this long take the vectorized path
+SCAN_BLOCK = 32    # block length of LinearScan
+LOOKAHEAD = 256    # shortest stretch scanned at once; doubles while clean
+
+THRUSTER_CHANNELS = ("vDIG", "vACT", "Current_Draw")
+
+def _powers(A, n):
+    P = [np.eye(len(A))]
+    for _ in range(n):
+        P.append(A @ P[-1])
+    return np.array(P)
+
+class LinearScan:
+    # s_t = A s_{t-1} + u_t over many steps at once. Within a block of m steps
+    # every state is a fixed linear map of the block's inputs and the state
+    # before it; the states before each block are the same recurrence with
+    # A^m, solved recursively.
+    def __init__(self, A, block=SCAN_BLOCK):
+        self.A = np.asarray(A, dtype=float)
+        self.block = block
+        self.P = _powers(self.A, block)  # A^0 .. A^block
+        d = len(self.A)
+        # Block maps as matrices so a whole stretch is two matmuls: flattened
+        # inputs -> flattened states, and state before the block -> its effect
+        j, i = np.indices((block, block))
+        T = np.where((j >= i)[..., None, None], self.P[np.maximum(j - i, 0)], 0.0)  # [j, i, d, e]
+        self.inputs = T.transpose(1, 3, 0, 2).reshape(block * d, block * d)
+        self.carry = self.P[1:].transpose(2, 0, 1).reshape(d, block * d)
+        self.outer = None
+
+    def __call__(self, u, s0):
+        # All states after each row of u (n x d), starting from s0
+        n, d = u.shape
+        m = self.block
+        nb = -(-n // m)
+        U = np.zeros((nb * m, d))
+        U[:n] = u
+        local = U.reshape(nb, m * d) @ self.inputs
+        if nb == 1:
+            return (s0 @ self.carry + local[0]).reshape(m, d)[:n]
+        if self.outer is None:
+            self.outer = LinearScan(self.P[m], m)
+        ends = self.outer(local[:, -d:], s0)
+        starts = np.vstack([s0[None], ends[:-1]])
+        out = starts @ self.carry + local
+        return out.reshape(-1, d)[:n]
+
+class ChannelState:
+    __slots__ = ("name", "level", "trend", "dev", "seen", "warmup", "event")
+
+    def __init__(self, name):
+        self.name = name
+        self.level = self.trend = self.dev = 0.0
+        self.seen = 0
+        self.warmup = []  # first samples, until the baseline is seeded
+        self.event = None  # [start, last, samples, peak value, peak deviation]
+
+class SpikeDetector:
+    def __init__(self, channels, k=K, rel_floor=REL_FLOOR, abs_floor=ABS_FLOOR, alpha=ALPHA,
+                 beta=BETA, gamma=GAMMA, clip=CLIP, warmup=WARMUP, max_event=MAX_EVENT):
+        self.channels = [ChannelState(name) for name in channels]
+        self.k, self.rel_floor, self.abs_floor = k, rel_floor, abs_floor
+        self.alpha, self.beta, self.gamma, self.clip = alpha, beta, gamma, clip
+        self.warmup, self.max_event = max(2, warmup), max_event * 1000
+        # Unfrozen Holt update as a linear map of (level, trend) and x
+        ab = alpha * beta
+        self.holt = LinearScan([[1 - alpha, 1 - alpha], [-ab, 1 - ab]])
+        self.holt_in = np.array([alpha, ab])
+        self.deviation = LinearScan([[1 - gamma]])
+
+    # --------------------------------------------------------------------------
+    # Sample by sample
+    # --------------------------------------------------------------------------
+    def _close(self, ch, events, level_shift=False):
+        start, last, samples, peak, deviation = ch.event
+        events.append({"channel": ch.name, "start": start, "end": last, "samples": samples,
+                       "peak": peak, "deviation": deviation, "level_shift": level_shift})
+        ch.event = None
+
+    def _seed(self, ch):
+        # Line through the warm-up samples: median step as the trend, median
+        # offset as the level, median distance from it as the deviation
+        x = np.array(ch.warmup)
+        trend = float(np.median(np.diff(x)))
+        offsets = x - trend * np.arange(len(x))
+        base = float(np.median(offsets))
+        ch.level, ch.trend = base + trend * (len(x) - 1), trend
+        ch.dev = float(np.median(np.abs(offsets - base)))
+        ch.warmup = None
+
+    def _step(self, ch, t, x, events):
+        if x != x:  # NaN
+            return
+        ch.seen += 1
+        if ch.warmup is not None:
+            ch.warmup.append(x)
+            if ch.seen == self.warmup:
+                self._seed(ch)
+            return
+        f = ch.level + ch.trend
+        r = x - f
+        threshold = self.k * ch.dev + max(self.abs_floor, self.rel_floor * abs(f))
+        if abs(r) > threshold:
+            ch.level = f
+            event = ch.event
+            if event is None:
+                ch.event = [t, t, 1, x, r]
+            else:
+                event[1] = t
+                event[2] += 1
+                if abs(r) > abs(event[4]):
+                    event[3], event[4] = x, r
+                if t - event[0] >= self.max_event:
+                    self._close(ch, events, level_shift=True)
+                    ch.level, ch.trend = x, 0.0
+            return
+        if ch.event is not None:
+            self._close(ch, events)
+        limit = self.clip * threshold
+        r = min(max(r, -limit), limit)
+        ch.level = f + self.alpha * r
+        ch.trend += self.alpha * self.beta * r
+        ch.dev += self.gamma * (abs(r) - ch.dev)
+
+    # --------------------------------------------------------------------------
+    # Vectorized
+    # --------------------------------------------------------------------------
+    def _clean_prefix(self, ch, x):
+        # Runs the unfrozen filter over x from ch's state and returns how many
+        # leading samples need neither a flag nor clipping (and aren't NaN),
+        # plus the state after them
+        # NaNs are zeroed for the scan (a NaN would spread through its whole
+        # block) and stop it instead
+        missing = np.isnan(x)
+        s0 = np.array([ch.level, ch.trend])
+        states = self.holt(np.outer(np.where(missing, 0.0, x), self.holt_in), s0)
+        before = np.vstack([s0[None], states[:-1]])
+        f = before[:, 0] + before[:, 1]
+        r = x - f
+        dev = self.deviation((self.gamma * np.abs(np.where(missing, 0.0, r)))[:, None], np.array([ch.dev]))[:, 0]
+        dev_before = np.concatenate([[ch.dev], dev[:-1]])
+        threshold = self.k * dev_before + np.maximum(self.abs_floor, self.rel_floor * np.abs(f))
+        stop = np.flatnonzero(missing | (np.abs(r) > self.clip * threshold))
+        n = int(stop[0]) if len(stop) else len(x)
+        if n == 0:
+            return 0, None
+        return n, (float(states[n - 1, 0]), float(states[n - 1, 1]), float(dev[n - 1]))
+
+    def _run(self, ch, times, x, events):
+        i, end = 0, len(x)
+        lookahead = LOOKAHEAD
+        while i < end:
+            # Warm-up samples, open events and the sample that stopped the
+            # last scan are stepped one by one
+            if ch.warmup is not None or ch.event is not None:
+                self._step(ch, int(times[i]), float(x[i]), events)
+                i += 1
+                continue
+            chunk = x[i:i + lookahead]
+            n, state = self._clean_prefix(ch, chunk)
+            if n:
+                ch.level, ch.trend, ch.dev = state
+                ch.seen += n
+                i += n
+            if n == len(chunk):
+                lookahead *= 2
+            else:
+                self._step(ch, int(times[i]), float(x[i]), events)
+                i += 1
+                # Spikes tend to be periodic: size the next scan from this gap
+                lookahead = max(LOOKAHEAD, 2 * n)
+
+    # --------------------------------------------------------------------------
+    # API
+    # --------------------------------------------------------------------------
+    def update(self, times, values, vectorized=None):
+        # times: int64 ms (n,), values: (n, channels). Returns the events that
+        # ended within these samples. vectorized=None picks by block length.
+        values = np.asarray(values, dtype=float)
+        times = np.asarray(times).astype("datetime64[ms]").astype(np.int64)
+        if vectorized is None:
+            vectorized = len(times) >= SCAN_MIN
+        events = []
+        for c, ch in enumerate(self.channels):
+            x = values[:, c]
+            if vectorized:
+                self._run(ch, times, np.ascontiguousarray(x), events)
+            else:
+                for t, v in zip(times.tolist(), x.tolist()):
+                    self._step(ch, t, v, events)
+        events.sort(key=lambda e: e["start"])
+        return events
+
+    def flush(self):
+        # Closes events still open at the last sample (e.g. at end of data)
+        events = []
+        for ch in self.channels:
+            if ch.event is not None:
+                self._close(ch, events)
+        return events
+
+def detect(times, values, channels, vectorized=True, **params):
+    # Events over whole arrays, e.g. a sheet: one detector, fed once
+    detector = SpikeDetector(channels, **params)
+    return detector.update(times, values, vectorized) + detector.flush()
+
+def detect_sheets(sheets, **params):
+    # Events on the thruster channels of (title, header, times, columns)
+    # sheets; channels are named "<sheet>.<column>"
+    events = []
+    for title, header, times, columns in sheets:
+        picked = [c for c, name in enumerate(header[1:]) if name in THRUSTER_CHANNELS]
+        if not title.startswith("Thruster_") or not picked:
+            continue
+        names = [f"{title}.{header[1 + c]}" for c in picked]
+        values = np.column_stack([columns[c] for c in picked])
+        events += detect(times, values, names, **params)
+    events.sort(key=lambda e: (e["start"], e["channel"]))
+    return events
+
+# ------------------------------------------------------------------------------
+# Validation against known spike windows
+# ------------------------------------------------------------------------------
+def match_windows(events, windows):
+    # windows: [(start ms, end ms)) of known spikes on one channel. An event
+    # overlapping a window finds it; events overlapping none are false alarms.
+    windows = sorted(windows)
+    found = set()
+    false_alarms = 0
+    for e in events:
+        hits = [w for w, (s, t) in enumerate(windows) if e["start"] < t and e["end"] >= s]
+        found.update(hits)
+        false_alarms += not hits
+    return {"windows": len(windows), "found": len(found), "missed": len(windows) - len(found),
+            "false_alarms": false_alarms}
+
+def demo_sheet(rate=None, duration=None):
+    # The demo.py thruster sheet in memory, with its spike windows in ms
+    import demo
+    from functools import partial
+    from telemetry_io import compute_chunk, make_sheet
+
+    rate = rate or demo.rate
+    duration = duration or demo.total_seconds
+    interval = 1.0 / rate
+    schedule = demo.spike_schedule(demo.spike_starts, demo.spike_duration)
+    sheet = make_sheet("Thruster_1", demo.header, demo.start_time, interval, int(round(duration * rate)),
+                       partial(demo.columns, interval=interval, schedule=schedule))
+    times, columns = compute_chunk(sheet, 0, sheet["num_points"])
+    origin = int(np.datetime64(demo.start_time, "ms").astype(np.int64))
+    windows = [(origin + int(s * 1000), origin + int((s + demo.spike_duration) * 1000))
+               for s in demo.spike_starts if s < duration]
+    return (sheet["title"], sheet["header"], times, columns), windows
+
+def validate(rate=None, duration=None, vectorized=True):
+    sheet, windows = demo_sheet(rate, duration)
+    events = detect_sheets([sheet], vectorized=vectorized)
+    results = {}
+    for name in THRUSTER_CHANNELS:
+        channel = f"{sheet[0]}.{name}"
+        results[channel] = match_windows([e for e in events if e["channel"] == channel], windows)
+    return events, results
+
+# ------------------------------------------------------------------------------
+# Command line
+# ------------------------------------------------------------------------------
+def format_event(e):
+    start = np.datetime64(e["start"], "ms")
+    kind = "level shift" if e["level_shift"] else "spike"
+    return (f"{start} {e['channel']}: {kind}, {e['samples']} sample(s) over {e['end'] - e['start']} ms, "
+            f"peak {e['peak']:g} ({e['deviation']:+.3g} from forecast)")
+
+def run_live(args):
+    # Incremental mode over the live demografana signals (telemetry_server)
+    from telemetry_server import LiveSource, live_sheets
+
+    source = LiveSource(live_sheets(args.seed, args.rate), args.rate)
+    detectors = []
+    for sheet in source.sheets:
+        if sheet["title"].startswith("Thruster_"):
+            names = [f"{sheet['title']}.{name}" for name in sheet["header"][1:]]
+            detectors.append((source.sheets.index(sheet), SpikeDetector(names)))
+    source.start()
+    seen = source.samples
+    found = 0
+    deadline = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < deadline:
+            source.wait_tick(seen, timeout=0.5)
+            with source.lock:
+                new = source.samples - seen
+                blocks = {k: source.rings[k].last(new) for k, _ in detectors} if new > 0 else {}
+                seen = source.samples
+            for k, detector in detectors:
+                if k in blocks:
+                    for e in detector.update(*blocks[k]):
+                        print(format_event(e), flush=True)
+                        found += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.stop()
+    print(f"{found} events on {sum(len(d.channels) for _, d in detectors)} channels")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detect spikes on thruster vDIG/vACT/Current_Draw channels.")
+    parser.add_argument("inputs", nargs="*", help="xlsx workbooks, csv files or table directories")
+    parser.add_argument("--validate", action="store_true",
+                        help="check detection against demo.py's known spike_starts")
+    parser.add_argument("--rate", type=float, default=None, help="sample rate for --validate / --live")
+    parser.add_argument("--duration", type=float, default=None, help="seconds of demo data for --validate")
+    parser.add_argument("--live", action="store_true", help="detect on live demografana telemetry")
+    parser.add_argument("--seconds", type=float, default=60.0, help="how long to run --live")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the --live signals")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.live:
+        args.rate = args.rate or 10.0
+        run_live(args)
+        return 0
+    if args.validate:
+        events, results = validate(args.rate, args.duration)
+        for e in events:
+            print(format_event(e))
+        ok = True
+        for channel, r in results.items():
+            print(f"{channel}: {r['found']}/{r['windows']} spikes found, {r['false_alarms']} false alarms")
+            ok = ok and not r["missed"] and not r["false_alarms"]
+        return 0 if ok else 1
+
+    from tsstore import read_sheets
+    for path in args.inputs:
+        sheets = []
+        for title, header, blocks in read_sheets(path):
+            blocks = list(blocks)
+            if not blocks:
+                continue
+            times = np.concatenate([t for t, _ in blocks])
+            columns = [np.concatenate([c[j] for _, c in blocks]) for j in range(len(header) - 1)]
+            sheets.append((title, header, times, columns))
+        started = time.perf_counter()
+        events = detect_sheets(sheets)
+        elapsed = time.perf_counter() - started
+        for e in events:
+            print(format_event(e))
+        rows = sum(len(s[2]) for s in sheets if s[0].startswith("Thruster_"))
+        print(f"{path}: {len(events)} events in {rows} thruster rows ({elapsed * 1000:.1f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,334 @@
+import csv
+import os
+from collections import deque
+import numpy as np
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+
+# pyarrow is only needed for the Arrow IPC/Feather and Parquet backends
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Rows generated and written per chunk. Memory use is bounded by one chunk per
+# sheet regardless of how long the run is. Random channels are seeded per
+# chunk, so output is reproducible for a given seed and chunk size.
+CHUNK_ROWS = 65536
+
+# Excel display format matching the old "%-m/%-d/%y %-H:%M:%S" strings, with
+# milliseconds for sheets sampled faster than 1 Hz
+EXCEL_TIME_FORMAT = "m/d/yy h:mm:ss"
+EXCEL_TIME_FORMAT_MS = "m/d/yy h:mm:ss.000"
+
+# ------------------------------------------------------------------------------
+# Sheets
+#
+# A sheet is a dict describing how to generate it: title, header, time axis
+# (start, interval in seconds, num_points), a picklable columns_fn(i, rng) that returns
+# the columns for the sample indices i, and a seed_key identifying its random
+# stream. Chunks are produced on demand by iter_chunks.
+#
+# columns_fn draws its random values row by row (e.g. one (rows, channels)
+# array), so the first k rows of a chunk come out the same however long the
+# chunk is. A sheet can then be extended later (write_output's `existing`)
+# and match a sheet generated at the longer length in one go.
+# ------------------------------------------------------------------------------
+def time_axis(start, i, interval):
+    # Millisecond resolution so fractional intervals (e.g. 1 kHz) are exact
+    offsets = np.round(i * (interval * 1000)).astype(np.int64)
+    return np.datetime64(start, "ms") + offsets.astype("timedelta64[ms]")
+
+def whole_seconds(interval):
+    return float(interval).is_integer()
+
+def make_sheet(title, header, start, interval, num_points, columns_fn, seed_key=(0,), chunk_rows=CHUNK_ROWS):
+    return {
+        "title": title,
+        "header": header,
+        "start": start,
+        "interval": interval,
+        "num_points": num_points,
+        "columns_fn": columns_fn,
+        "seed_key": tuple(seed_key),
+        "chunk_rows": chunk_rows,
+    }
+
+def compute_chunk(sheet, i0, i1):
+    # Runs in worker processes, so it only depends on the sheet dict. A range
+    # starting inside a chunk is computed from the chunk's start and trimmed,
+    # so rows come out the same however the sheet is split up.
+    c0 = i0 - i0 % sheet["chunk_rows"] if i1 > i0 else i0
+    i = np.arange(c0, i1)
+    rng = np.random.default_rng([*sheet["seed_key"], c0 // sheet["chunk_rows"]])
+    times, columns = time_axis(sheet["start"], i, sheet["interval"]), sheet["columns_fn"](i, rng)
+    if c0 < i0:
+        times, columns = times[i0 - c0:], [c[i0 - c0:] for c in columns]
+    return times, columns
+
+def chunk_ranges(sheet, first=0):
+    # (i0, i1) of the chunks holding rows first.. of a sheet, on the chunk grid
+    size, end = sheet["chunk_rows"], sheet["num_points"]
+    i0 = first
+    while i0 < end:
+        i1 = min((i0 // size + 1) * size, end)
+        yield i0, i1
+        i0 = i1
+
+def iter_chunks(sheets, executor=None, workers=1, first_rows=None):
+    # Yields (sheet_index, time, columns) in sheet-major, time-ascending order,
+    # starting each sheet at first_rows[index] (default 0).
+    # With an executor of `workers` processes, chunks of all sheets are computed
+    # in parallel but only 2 * workers results are kept in flight, so memory
+    # stays bounded.
+    first_rows = first_rows or {}
+    tasks = [
+        (index, sheet, i0, i1)
+        for index, sheet in enumerate(sheets)
+        for i0, i1 in chunk_ranges(sheet, first_rows.get(index, 0))
+    ]
+    if executor is None:
+        for index, sheet, i0, i1 in tasks:
+            yield (index, *compute_chunk(sheet, i0, i1))
+        return
+
+    prefetch = 2 * max(1, workers)
+    pending = deque()
+    for index, sheet, i0, i1 in tasks:
+        pending.append((index, executor.submit(compute_chunk, sheet, i0, i1)))
+        if len(pending) >= prefetch:
+            index, future = pending.popleft()
+            yield (index, *future.result())
+    while pending:
+        index, future = pending.popleft()
+        yield (index, *future.result())
+
+# ------------------------------------------------------------------------------
+# Streaming xlsx writer
+#
+# A zip archive can't be appended to in place, so appending (existing maps
+# sheet titles to the rows already written) streams the old rows into a new
+# workbook beside the old one and then swaps it in. Only the new rows are
+# computed.
+# ------------------------------------------------------------------------------
+def _time_cell(ws, sheet):
+    # Rows are serialized on append, so a single styled cell can be reused
+    time_cell = WriteOnlyCell(ws)
+    if whole_seconds(sheet["interval"]):
+        time_cell.number_format = EXCEL_TIME_FORMAT
+    else:
+        time_cell.number_format = EXCEL_TIME_FORMAT_MS
+    return time_cell
+
+def _tmp_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}.tmp{ext}"
+
+def write_xlsx(sheets, filename, executor=None, existing=None, workers=1):
+    # Write-only workbooks stream each row to a temp file as it is appended,
+    # so nothing accumulates as cell objects until save. Workers only compute
+    # the chunks: openpyxl serializes every row in this process, so xlsx
+    # export is bound by that serial step however many workers there are.
+    existing = existing or {}
+    old = load_workbook(filename, read_only=True) if existing else None
+    try:
+        wb = Workbook(write_only=True)
+        worksheets = []
+        for sheet in sheets:
+            ws = wb.create_sheet(title=sheet["title"])
+            ws.column_dimensions["A"].width = 18
+            ws.append(sheet["header"])
+            worksheets.append(ws)
+            kept = existing.get(sheet["title"], 0)
+            if kept:
+                time_cell = _time_cell(ws, sheet)
+                rows = old[sheet["title"]].iter_rows(min_row=2, max_row=kept + 1, values_only=True)
+                copied = 0
+                for t, *row in rows:
+                    time_cell.value = t
+                    ws.append([time_cell, *row])
+                    copied += 1
+                if copied != kept:
+                    raise ValueError(f"{filename}: sheet '{sheet['title']}' has {copied} rows, expected {kept}")
+
+        first_rows = {index: existing.get(sheet["title"], 0) for index, sheet in enumerate(sheets)}
+        for index, times, columns in iter_chunks(sheets, executor, workers, first_rows):
+            ws = worksheets[index]
+            time_cell = _time_cell(ws, sheets[index])
+            times = times.astype("datetime64[us]").tolist()
+            for t, row in zip(times, zip(*(c.tolist() for c in columns))):
+                time_cell.value = t
+                ws.append([time_cell, *row])
+        target = _tmp_path(filename) if old is not None else filename
+        wb.save(target)
+    finally:
+        if old is not None:
+            old.close()
+    if target != filename:
+        os.replace(target, filename)
+
+# ------------------------------------------------------------------------------
+# Columnar writers
+#
+# Each sheet becomes its own table file, <directory>/<title>.<ext>, with a
+# typed timestamp column and int/float value columns. Tables are opened on a
+# sheet's first chunk (which fixes the schema) and appended chunk by chunk.
+# ------------------------------------------------------------------------------
+def _require_pyarrow(fmt):
+    if pa is None:
+        raise RuntimeError(f"{fmt} output requires pyarrow (pip install pyarrow)")
+
+class CsvTable:
+    def __init__(self, path, header, times, columns, kept=0):
+        # Whole-second timestamps are written without a fractional part
+        self.unit = "s" if (times.astype(np.int64) % 1000 == 0).all() else "ms"
+        # Appended rows go straight onto the end of the file
+        self.file = open(path, "a" if kept else "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        if not kept:
+            self.writer.writerow(header)
+
+    def write(self, times, columns):
+        times = np.datetime_as_string(times, unit=self.unit).tolist()
+        self.writer.writerows(zip(times, *(c.tolist() for c in columns)))
+
+    def close(self):
+        self.file.close()
+
+    def finish(self):
+        self.close()
+
+class ArrowTable:
+    # Arrow IPC files have a footer, so appending copies the existing record
+    # batches into a new file, adds the new ones and swaps it in
+    def __init__(self, path, header, times, columns, kept=0):
+        _require_pyarrow("Arrow")
+        self.header = header
+        self.schema = self._batch(times, columns).schema
+        self.path, self.target = path, _tmp_path(path) if kept else path
+        self.sink = pa.OSFile(self.target, "wb")
+        options = pa.ipc.IpcWriteOptions(compression="lz4")
+        self.writer = pa.ipc.new_file(self.sink, self.schema, options=options)
+        self._keep(kept)
+
+    def _old_batches(self):
+        with pa.memory_map(self.path) as source:
+            reader = pa.ipc.open_file(source)
+            for k in range(reader.num_record_batches):
+                yield reader.get_batch(k)
+
+    def _keep(self, kept):
+        copied = 0
+        if kept:
+            for batch in self._old_batches():
+                batch = batch.slice(0, kept - copied)
+                self.writer.write_batch(batch)
+                copied += batch.num_rows
+                if copied == kept:
+                    break
+        if copied != kept:
+            self.close()
+            os.remove(self.target)
+            raise ValueError(f"{self.path}: has {copied} rows, expected {kept}")
+
+    def _batch(self, times, columns):
+        return pa.record_batch([pa.array(times), *(pa.array(c) for c in columns)], names=self.header)
+
+    def write(self, times, columns):
+        self.writer.write_batch(self._batch(times, columns))
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+    def finish(self):
+        self.close()
+        if self.target != self.path:
+            os.replace(self.target, self.path)
+
+class ParquetTable(ArrowTable):
+    def __init__(self, path, header, times, columns, kept=0):
+        _require_pyarrow("Parquet")
+        self.header = header
+        self.schema = self._batch(times, columns).schema
+        self.path, self.target = path, _tmp_path(path) if kept else path
+        self.writer = pq.ParquetWriter(self.target, self.schema, compression="zstd")
+        self._keep(kept)
+
+    def _old_batches(self):
+        return pq.ParquetFile(self.path).iter_batches(batch_size=CHUNK_ROWS)
+
+    def write(self, times, columns):
+        self.writer.write_batch(self._batch(times, columns))
+
+    def close(self):
+        self.writer.close()
+
+def _write_tables(sheets, directory, ext, table_cls, executor=None, existing=None, workers=1):
+    # existing maps sheet titles to rows already in their tables; each table
+    # is continued from there
+    existing = existing or {}
+    os.makedirs(directory, exist_ok=True)
+    first_rows = {index: existing.get(sheet["title"], 0) for index, sheet in enumerate(sheets)}
+    seen = set()
+    current_index, table = None, None
+    try:
+        for index, times, columns in iter_chunks(sheets, executor, workers, first_rows):
+            if index != current_index:
+                if table is not None:
+                    table.finish()
+                    table = None
+                path = os.path.join(directory, f"{sheets[index]['title']}.{ext}")
+                table = table_cls(path, sheets[index]["header"], times, columns, first_rows[index])
+                current_index = index
+                seen.add(index)
+            table.write(times, columns)
+        if table is not None:
+            table.finish()
+            table = None
+    finally:
+        if table is not None:
+            table.close()
+
+    # Sheets with no rows still get an (empty) table with the right schema
+    for index, sheet in enumerate(sheets):
+        if index not in seen and not first_rows[index]:
+            times, columns = compute_chunk(sheet, 0, 0)
+            path = os.path.join(directory, f"{sheet['title']}.{ext}")
+            table = table_cls(path, sheet["header"], times, columns)
+            table.write(times, columns)
+            table.close()
+
+def write_csv(sheets, directory, executor=None, existing=None, workers=1):
+    _write_tables(sheets, directory, "csv", CsvTable, executor, existing, workers)
+
+def write_feather(sheets, directory, executor=None, existing=None, workers=1):
+    _write_tables(sheets, directory, "feather", ArrowTable, executor, existing, workers)
+
+def write_parquet(sheets, directory, executor=None, existing=None, workers=1):
+    _write_tables(sheets, directory, "parquet", ParquetTable, executor, existing, workers)
+
+# Output backends by format name. xlsx writes a single workbook; the others
+# write one table per sheet into a directory.
+WRITERS = {
+    "xlsx": write_xlsx,
+    "csv": write_csv,
+    "feather": write_feather,
+    "parquet": write_parquet,
+}
+
+def output_path(stem, fmt):
+    return f"{stem}.xlsx" if fmt == "xlsx" else stem
+
+def write_output(sheets, path, fmt="xlsx", executor=None, existing=None, workers=1):
+    # existing: {sheet title: rows already in the output at `path`}. Those rows
+    # are kept and each sheet continues from the next one. workers: process
+    # count of `executor`, which bounds how many chunks are computed ahead.
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown output format '{fmt}' (expected one of {', '.join(WRITERS)})")
+    for sheet in sheets:
+        if existing and existing.get(sheet["title"], 0) > sheet["num_points"]:
+            raise ValueError(f"{path}: sheet '{sheet['title']}' already has {existing[sheet['title']]} rows, "
+                             f"more than the {sheet['num_points']} requested")
+    WRITERS[fmt](sheets, path, executor, existing, workers)
@@ -0,0 +1,268 @@
+import argparse
+import json
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import demografana
+from telemetry_io import compute_chunk
+
+# ------------------------------------------------------------------------------
+# Live synthetic telemetry for Grafana
+#
+# The same LDR, thruster and tank/feedline signals as demografana.py, released
+# in real time at a fixed sample rate into per-sheet ring buffers. Samples are
+# generated a block at a time (vectorized) ahead of the wall clock and handed
+# out as they fall due; HTTP requests only read the rings.
+#
+#   /metrics              Prometheus exposition of the latest sample
+#   /api/latest           latest sample per sheet as JSON
+#   /api/range?sheet=..&seconds=..   recent history of one sheet as JSON
+#   /stream               Server-Sent Events, one JSON message per tick
+#
+# Sample times are UTC (naive datetimes / datetime64), so the epoch-ms
+# timestamps in /metrics are right whatever the host's time zone.
+# ------------------------------------------------------------------------------
+class RingBuffer:
+    def __init__(self, capacity, channels):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype="datetime64[ms]")
+        self.values = np.zeros((capacity, channels))
+        self.count = 0  # samples appended since start
+
+    def append(self, times, values):
+        if len(times) > self.capacity:
+            skipped = len(times) - self.capacity
+            times, values = times[skipped:], values[skipped:]
+            self.count += skipped
+        idx = (self.count + np.arange(len(times))) % self.capacity
+        self.times[idx] = times
+        self.values[idx] = values
+        self.count += len(times)
+
+    def last(self, n):
+        # Up to n most recent samples, oldest first
+        n = min(n, self.count, self.capacity)
+        idx = (self.count - n + np.arange(n)) % self.capacity
+        return self.times[idx], self.values[idx]
+
+class LiveSource:
+    def __init__(self, sheets, rate, history_seconds=600, block_seconds=1.0):
+        self.sheets = sheets
+        self.rate = rate
+        self.block_rows = max(1, int(round(rate * block_seconds)))
+        for sheet in sheets:
+            # Blocks line up with the chunk grid so each is one seeded chunk
+            sheet["chunk_rows"] = self.block_rows
+        capacity = max(1, int(round(rate * history_seconds)))
+        self.rings = [RingBuffer(capacity, len(s["header"]) - 1) for s in sheets]
+        self._blocks = [None] * len(sheets)  # (i0, times, values) of the current block
+
+        self.lock = threading.Lock()
+        self.tick = threading.Condition(self.lock)
+        self.samples = 0  # samples released per sheet
+        self.stop_event = threading.Event()
+
+        # Prometheus series names don't change, so build them once
+        self.series = [
+            [f'telemetry_value{{sheet="{s["title"]}",channel="{name}"}}' for name in s["header"][1:]]
+            for s in sheets
+        ]
+        self._metrics_cache = (-1, b"")
+
+    def _rows(self, index, i0, i1):
+        # Rows [i0, i1) of one sheet, generating new blocks as needed
+        sheet = self.sheets[index]
+        parts_t, parts_v = [], []
+        while i0 < i1:
+            block = self._blocks[index]
+            if block is None or not block[0] <= i0 < block[0] + self.block_rows:
+                b0 = i0 - i0 % self.block_rows
+                times, columns = compute_chunk(sheet, b0, b0 + self.block_rows)
+                block = self._blocks[index] = (b0, times, np.column_stack(columns).astype(float))
+            b0, times, values = block
+            end = min(i1, b0 + self.block_rows)
+            parts_t.append(times[i0 - b0:end - b0])
+            parts_v.append(values[i0 - b0:end - b0])
+            i0 = end
+        return np.concatenate(parts_t), np.concatenate(parts_v)
+
+    def run(self):
+        t0 = time.monotonic()
+        while not self.stop_event.is_set():
+            due = int((time.monotonic() - t0) * self.rate) + 1
+            if due > self.samples:
+                new = [self._rows(k, self.samples, due) for k in range(len(self.sheets))]
+                with self.tick:
+                    for ring, (times, values) in zip(self.rings, new):
+                        ring.append(times, values)
+                    self.samples = due
+                    self.tick.notify_all()
+            # Sleep until the next sample falls due
+            self.stop_event.wait(max(0.0, t0 + self.samples / self.rate - time.monotonic()))
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        with self.tick:
+            self.tick.notify_all()
+
+    # --------------------------------------------------------------------------
+    # Views (all read under the lock; rendering is cached per tick)
+    # --------------------------------------------------------------------------
+    def metrics(self):
+        with self.lock:
+            if self._metrics_cache[0] == self.samples:
+                return self._metrics_cache[1]
+            lines = ["# TYPE telemetry_value gauge"]
+            for ring, names in zip(self.rings, self.series):
+                times, values = ring.last(1)
+                if not len(times):
+                    continue
+                ts = int(times[0].astype(np.int64))
+                lines += [f"{name} {v:.6g} {ts}" for name, v in zip(names, values[0].tolist())]
+            body = ("\n".join(lines) + "\n").encode()
+            self._metrics_cache = (self.samples, body)
+            return body
+
+    def latest(self):
+        with self.lock:
+            result = {}
+            for sheet, ring in zip(self.sheets, self.rings):
+                times, values = ring.last(1)
+                if len(times):
+                    result[sheet["title"]] = {"time": str(times[0]),
+                                              **dict(zip(sheet["header"][1:], values[0].tolist()))}
+            return result
+
+    def history(self, title, seconds):
+        with self.lock:
+            for sheet, ring in zip(self.sheets, self.rings):
+                if sheet["title"] == title:
+                    # Asking for more than the ring holds returns all of it
+                    # (and keeps a huge `seconds` from overflowing int())
+                    rows = seconds * self.rate
+                    times, values = ring.last(ring.capacity if rows >= ring.capacity else int(rows))
+                    return {"columns": sheet["header"],
+                            "time": np.datetime_as_string(times, unit="ms").tolist(),
+                            "values": values.tolist()}
+        return None
+
+    def wait_tick(self, seen, timeout=5.0):
+        with self.tick:
+            self.tick.wait_for(lambda: self.samples != seen or self.stop_event.is_set(), timeout)
+            return self.samples
+
+# ------------------------------------------------------------------------------
+# HTTP
+# ------------------------------------------------------------------------------
+class TelemetryHandler(BaseHTTPRequestHandler):
+    source = None  # set by serve()
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(json.dumps(data).encode(), "application/json", status)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._send(self.source.metrics(), "text/plain; version=0.0.4")
+        elif url.path == "/api/latest":
+            self._send_json(self.source.latest())
+        elif url.path == "/api/range":
+            query = parse_qs(url.query)
+            title = query.get("sheet", [""])[0]
+            try:
+                seconds = float(query.get("seconds", ["60"])[0])
+            except ValueError:
+                seconds = math.nan
+            if not (math.isfinite(seconds) and seconds > 0):
+                self._send_json({"error": "seconds must be a positive number"}, 400)
+                return
+            data = self.source.history(title, seconds)
+            if data is None:
+                self._send_json({"error": f"unknown sheet '{title}'"}, 404)
+            else:
+                self._send_json(data)
+        elif url.path == "/stream":
+            self.stream()
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        seen = -1
+        try:
+            while not self.source.stop_event.is_set():
+                seen = self.source.wait_tick(seen)
+                self.wfile.write(f"data: {json.dumps(self.source.latest())}\n\n".encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape is too noisy at 10+ Hz
+
+def serve(source, host="127.0.0.1", port=9108):
+    handler = type("Handler", (TelemetryHandler,), {"source": source})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def live_sheets(seed, rate, ldr_channels=demografana.DEFAULTS["ldr_channels"],
+                thrusters=demografana.DEFAULTS["thrusters"]):
+    # demografana sheets starting now (UTC); the durations only bound sheet
+    # length and a live source never reaches them
+    forever = 10 * 365 * 24 * 3600
+    return demografana.generate_sheets(
+        seed, start=datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None),
+        ldr_duration=forever, thruster_duration=forever, tank_duration=forever,
+        ldr_rate=rate, thruster_rate=rate, tank_rate=rate,
+        ldr_channels=ldr_channels, thrusters=thrusters,
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve live synthetic telemetry for Grafana.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9108)
+    parser.add_argument("--rate", type=demografana.positive, default=10.0, help="samples per second for every sheet")
+    parser.add_argument("--history", type=demografana.positive, default=600.0, help="seconds of samples kept per sheet")
+    parser.add_argument("--ldr-channels", type=int, default=demografana.DEFAULTS["ldr_channels"])
+    parser.add_argument("--thrusters", type=int, default=demografana.DEFAULTS["thrusters"])
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    seed = demografana.new_seed() if args.seed is None else args.seed
+    sheets = live_sheets(seed, args.rate, args.ldr_channels, args.thrusters)
+    source = LiveSource(sheets, args.rate, args.history)
+    source.start()
+
+    server = serve(source, args.host, args.port)
+    channels = sum(len(s["header"]) - 1 for s in sheets)
+    print(f"Serving {channels} channels at {args.rate:g} Hz on http://{args.host}:{args.port} (seed {seed})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
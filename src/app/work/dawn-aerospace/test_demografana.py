@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from demografana import generate_ldr, generate_thruster
+from events import EventSchedule
+
+# ------------------------------------------------------------------------------
+# Generated waveforms at different sample rates (python -m pytest test_demografana.py)
+# ------------------------------------------------------------------------------
+RATES = [1 / 3, 1.0, 7.0, 10.0, 1000.0]
+
+def columns(sheet):
+    i = np.arange(sheet["num_points"])
+    return sheet["columns_fn"](i, np.random.default_rng(0))
+
+@pytest.mark.parametrize("rate", RATES)
+def test_thruster_spikes_once_per_period(rate):
+    sheet = generate_thruster(0, 1, "2025-01-01 00:00:00", total_seconds=3600, rate=rate)
+    plain = generate_thruster(0, 1, "2025-01-01 00:00:00", total_seconds=3600, rate=rate,
+                              schedule=EventSchedule())
+    for column, baseline in zip(columns(sheet), columns(plain)):
+        assert (column != baseline).sum() == 120
+
+@pytest.mark.parametrize("rate", RATES)
+def test_ldr_drops_last_five_seconds_each_period(rate):
+    sheet = generate_ldr(0, "2025-01-01 00:00:00", total_seconds=3600, rate=rate, channels=1)
+    (ldr,) = columns(sheet)
+    assert (ldr < 1023).sum() == 120 * int(np.ceil(5 * rate))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from events import EventSchedule
+
+# ------------------------------------------------------------------------------
+# EventSchedule overlaps and periodic events (python -m pytest test_events.py)
+# ------------------------------------------------------------------------------
+def test_long_event_resumes_after_short_one_inside_it():
+    schedule = EventSchedule()
+    schedule.add("stuck", "Thruster_1.vACT", 10, 60, 20.0)
+    schedule.add("stuck", "Thruster_1.vACT", 30, 1, 99.0)
+    t = np.arange(0, 100, 0.5)
+    out = schedule.apply("Thruster_1.vACT", t, np.zeros(len(t)))
+    assert (out[t < 10] == 0).all()
+    assert (out[(t >= 10) & (t < 30)] == 20).all()
+    assert (out[(t >= 30) & (t < 31)] == 99).all()
+    assert (out[(t >= 31) & (t < 70)] == 20).all()
+    assert (out[t >= 70] == 0).all()
+
+def test_ramp_keeps_its_own_slope_around_a_nested_ramp():
+    schedule = EventSchedule()
+    schedule.add("ramp", "c", 0, 100, 10.0)
+    schedule.add("ramp", "c", 40, 10, 5.0)
+    t = np.array([20.0, 45.0, 60.0])
+    out = schedule.apply("c", t, np.zeros(3))
+    assert np.allclose(out, [2.0, 2.5, 6.0])
+
+def test_latest_start_wins_and_ties_go_to_the_last_added():
+    schedule = EventSchedule()
+    schedule.add("spike", "c", 0, 10, 1.0)
+    schedule.add("spike", "c", 5, 10, 2.0)
+    schedule.add("spike", "c", 5, 2, 3.0)
+    t = np.arange(0, 16, 1.0)
+    out = schedule.apply("c", t, np.zeros(len(t)))
+    assert out.tolist() == [1] * 5 + [3] * 2 + [2] * 8 + [0]
+
+@pytest.mark.parametrize("rate", [1 / 3, 1.0, 7.0, 10.0, 1000.0])
+def test_one_sample_periodic_spike_hits_one_sample_per_period(rate):
+    # A spike one sample long every 30 s: 120 spikes over an hour at any rate
+    interval = 1.0 / rate
+    schedule = EventSchedule()
+    schedule.add_periodic("spike", "c", 30.0, interval, 1.0)
+    i = np.arange(int(round(3600 * rate)))
+    out = schedule.apply("c", i * interval, np.zeros(len(i)))
+    hits = np.flatnonzero(out)
+    assert len(hits) == 120
+    assert np.allclose(hits * interval, np.arange(120) * 30.0)
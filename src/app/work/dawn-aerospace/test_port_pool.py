@@ -0,0 +1,108 @@
+import os
+import select
+import threading
+import time
+import pytest
+from port_pool import ConnectionPool, PortWorker
+
+serial = pytest.importorskip("serial")
+
+# ------------------------------------------------------------------------------
+# PortWorker / ConnectionPool against a pty node (python -m pytest test_port_pool.py)
+# ------------------------------------------------------------------------------
+class PtyNode(threading.Thread):
+    # Plays a node on the master side of a pty: replies "ok:<frame>" to each
+    # frame, except those in `silent`, which it swallows
+    def __init__(self, silent=(), delay=0.0):
+        super().__init__(daemon=True)
+        self.master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        self.slave = slave  # kept open so the pty survives reconnects
+        self.silent = set(silent)
+        self.delay = delay
+        self.frames = []
+        self.running = True
+        self.start()
+
+    def run(self):
+        buffer = b""
+        while self.running:
+            if not select.select([self.master], [], [], 0.05)[0]:
+                continue
+            try:
+                buffer += os.read(self.master, 1024)
+            except OSError:
+                continue
+            while b"\n" in buffer:
+                line, buffer = buffer.split(b"\n", 1)
+                self.frames.append(line)
+                if line in self.silent:
+                    continue
+                time.sleep(self.delay)
+                os.write(self.master, b"ok:" + line + b"\n")
+
+    def close(self):
+        self.running = False
+        self.join(1)
+        os.close(self.master)
+        os.close(self.slave)
+
+def opener(port):
+    return serial.serial_for_url(port, timeout=0.3)
+
+@pytest.fixture
+def node():
+    node = PtyNode()
+    yield node
+    node.close()
+
+def test_reply(node):
+    worker = PortWorker(node.port, opener)
+    worker.start()
+    try:
+        assert worker.submit(b"1:ping\n").result(2) == b"ok:1:ping\n"
+    finally:
+        worker.stop()
+        worker.join(2)
+
+def test_reconnects_and_resends_when_the_write_fails(node):
+    worker = PortWorker(node.port, opener, reconnect_delay=0.01)
+    worker.start()
+    try:
+        assert worker.submit(b"1:a\n").result(2) == b"ok:1:a\n"
+        worker.conn.close()  # the link drops between commands
+        assert worker.submit(b"1:b\n").result(2) == b"ok:1:b\n"
+        assert worker.reconnects == 1
+        assert node.frames == [b"1:a", b"1:b"]
+    finally:
+        worker.stop()
+        worker.join(2)
+
+def test_read_timeout_fails_without_resending():
+    node = PtyNode(silent=[b"1:fire"])
+    worker = PortWorker(node.port, opener, reconnect_delay=0.01)
+    worker.start()
+    try:
+        with pytest.raises(TimeoutError):
+            worker.submit(b"1:fire\n").result(2)
+        assert worker.submit(b"1:status\n").result(2) == b"ok:1:status\n"
+        assert node.frames == [b"1:fire", b"1:status"]
+    finally:
+        worker.stop()
+        worker.join(2)
+        node.close()
+
+def test_commands_on_one_port_are_serialized():
+    node = PtyNode(delay=0.005)
+    pool = ConnectionPool(opener)
+    try:
+        nodes = [{"scid": scid, "com": node.port} for scid in (1, 2)]
+        futures = [(f"{n['scid']}:cmd{k}".encode(), pool.send(n, f"{n['scid']}:cmd{k}\n".encode()))
+                   for k in range(20) for n in nodes]
+        for frame, future in futures:
+            assert future.result(5) == b"ok:" + frame + b"\n"
+        assert node.frames == [frame for frame, _ in futures]
+        assert len(pool.workers) == 1
+    finally:
+        pool.close()
+        node.close()
@@ -0,0 +1,61 @@
+import threading
+import time
+import pytest
+from checkpoint import Checkpoint
+from rig_service import RigService
+
+# ------------------------------------------------------------------------------
+# RigService run lifecycle (python -m pytest test_rig_service.py)
+# ------------------------------------------------------------------------------
+SEQUENCE = [{"type": "delay", "seconds": 0.05}] * 4
+
+async def send_fast(command, node):
+    return "ok"
+
+def test_cancel_before_start_finishes_the_run(tmp_path):
+    service = RigService(send_fast, checkpoint_dir=str(tmp_path)).start()
+    try:
+        run_ids = [service.submit(f"rig-{k}", SEQUENCE) for k in range(20)]
+        for run_id in run_ids:
+            assert service.cancel(run_id)
+        assert service.wait(run_ids, timeout=2)
+        assert {s["state"] for s in service.status()} == {"cancelled"}
+        assert not service.active()
+    finally:
+        t0 = time.monotonic()
+        service.stop(timeout=5)
+    assert time.monotonic() - t0 < 1
+
+def test_run_completes():
+    service = RigService(send_fast).start()
+    try:
+        run_id = service.submit("rig", SEQUENCE)
+        assert service.wait([run_id], timeout=2)
+        assert service.run(run_id).state == "completed"
+        assert service.run(run_id).completed == len(SEQUENCE)
+    finally:
+        service.stop()
+
+@pytest.mark.parametrize("name", ["../x", "a/b", "..", ".hidden", "a\\b", ""])
+def test_unsafe_run_names_are_rejected(tmp_path, name):
+    service = RigService(send_fast, checkpoint_dir=str(tmp_path)).start()
+    try:
+        with pytest.raises(ValueError):
+            service.submit(name, SEQUENCE)
+    finally:
+        service.stop()
+
+def test_checkpoints_are_written_off_the_loop(tmp_path, monkeypatch):
+    threads = []
+    write, clear = Checkpoint.write, Checkpoint.clear
+    monkeypatch.setattr(Checkpoint, "write", lambda self: (threads.append(threading.current_thread()), write(self)))
+    monkeypatch.setattr(Checkpoint, "clear", lambda self: (threads.append(threading.current_thread()), clear(self)))
+    service = RigService(send_fast, checkpoint_dir=str(tmp_path)).start()
+    try:
+        run_id = service.submit("rig", SEQUENCE)
+        assert service.wait([run_id], timeout=2)
+        assert service.run(run_id).state == "completed"
+    finally:
+        service.stop()
+    assert threads and service.thread not in threads
+    assert not list(tmp_path.iterdir())
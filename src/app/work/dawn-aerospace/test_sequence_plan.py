@@ -0,0 +1,55 @@
+import pytest
+from sequence_plan import (compile_sequence, PlanCursor, EV_COMMAND, EV_DELAY, EV_LOOP,
+                           EV_ITERATION, EV_END_ITERATION)
+
+# ------------------------------------------------------------------------------
+# PlanCursor, the plan walk shared by the executors (python -m pytest test_sequence_plan.py)
+# ------------------------------------------------------------------------------
+SEQUENCE = [
+    {"type": "command", "command": "arm", "nodes": []},
+    {"type": "loop", "count": 2, "tasks": [
+        {"type": "delay", "seconds": 1},
+        {"type": "loop", "count": 0, "tasks": [{"type": "command", "command": "never", "nodes": []}]},
+    ]},
+    {"type": "command", "command": "fire", "nodes": []},
+]
+NAMES = {EV_COMMAND: "command", EV_DELAY: "delay", EV_LOOP: "loop",
+         EV_ITERATION: "iteration", EV_END_ITERATION: "end"}
+
+class FakeCheckpoint:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, pc, counters, completed):
+        self.updates.append((pc, list(counters), completed))
+
+def events(cursor):
+    return [(NAMES[event], pc, list(cursor.counters)) for event, pc in cursor.walk()]
+
+def test_walk_expands_loops_and_skips_empty_ones():
+    plan = compile_sequence(SEQUENCE)
+    cursor = PlanCursor(plan)
+    assert events(cursor) == [
+        ("command", 0, []),
+        ("loop", 1, []), ("iteration", 6, [1]),
+        ("delay", 2, [1]), ("loop", 3, [1]), ("end", 6, [1]),
+        ("iteration", 6, [2]),
+        ("delay", 2, [2]), ("loop", 3, [2]), ("end", 6, [2]),
+        ("command", 7, []),
+    ]
+    assert cursor.finished and cursor.completed == 4
+
+def test_resuming_from_a_checkpointed_position_runs_the_rest():
+    plan = compile_sequence(SEQUENCE)
+    checkpoint = FakeCheckpoint()
+    full = [(e, pc) for e, pc in PlanCursor(plan, checkpoint=checkpoint).walk() if e in (EV_COMMAND, EV_DELAY)]
+    for k, (pc, counters, completed) in enumerate(checkpoint.updates):
+        cursor = PlanCursor(plan, (pc, counters, completed))
+        rest = [(e, p) for e, p in cursor.walk() if e in (EV_COMMAND, EV_DELAY)]
+        assert rest == full[k:]
+        assert cursor.completed == len(full)
+
+@pytest.mark.parametrize("start", [(99, [], 0), (-1, [], 0), (2, [], 0), (2, [3], 0)])
+def test_invalid_start_is_rejected(start):
+    with pytest.raises(ValueError):
+        PlanCursor(compile_sequence(SEQUENCE), start)
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import numpy as np
+from telemetry_io import time_axis
+
+# ------------------------------------------------------------------------------
+# Telemetry capture to memory-mapped ring files
+#
+# One ring file per sheet (channel group). Every channel has its own ring of
+# fixed 16-byte records, so capture memory and disk use are fixed up front no
+# matter how long a run lasts; the oldest records are overwritten.
+#
+#   offset 0            b"TLMRING1", header length (int64), JSON header
+#   counters_offset     written-record counter per channel (int64)
+#   data_offset         records[channel][capacity]: t (ms since epoch, int64),
+#                       step tag (int32), value (float32)
+#
+# Both offsets are the end of the previous section rounded up to ALIGN bytes.
+#
+# A channel with decimate=N stores one record per N input samples: the mean of
+# the window, stamped with the window's last sample time and step tag. Records
+# are written before the channel's counter, so a reader never sees a counter
+# ahead of its data.
+#
+# Step tags come from set_step(): the capture notes the source's sample count
+# as each step starts, so every sample released after that belongs to the
+# step (0 = before the first step). Boundaries are sample indices on the
+# source's own clock, never wall time, which the synthetic timeline doesn't
+# follow exactly. The steps themselves (with their first sample's index and
+# time) are appended to steps.jsonl next to the ring files, so samples can be
+# joined back to steps.
+# ------------------------------------------------------------------------------
+MAGIC = b"TLMRING1"
+ALIGN = 64
+RECORD = np.dtype([("t", "<i8"), ("step", "<i4"), ("value", "<f4")])
+
+def _offsets(header_length, channels):
+    counters_offset = 16 + header_length
+    counters_offset += -counters_offset % ALIGN
+    data_offset = counters_offset + 8 * channels
+    data_offset += -data_offset % ALIGN
+    return counters_offset, data_offset
+
+class RingFile:
+    def __init__(self, path, title, channels, capacity, decimate=None):
+        decimate = [int(d) for d in (decimate or [1] * len(channels))]
+        if len(decimate) != len(channels) or min(decimate) < 1:
+            raise ValueError("decimate needs one factor >= 1 per channel")
+        self.path = path
+        self.channels = list(channels)
+        self.capacity = capacity
+        self.decimate = decimate
+
+        header = json.dumps({"title": title, "channels": self.channels, "capacity": capacity,
+                             "decimate": decimate, "record": RECORD.descr}).encode()
+        counters_offset, data_offset = _offsets(len(header), len(channels))
+
+        with open(path, "wb") as f:
+            f.write(MAGIC + np.int64(len(header)).tobytes() + header)
+            # Sized once; untouched regions stay sparse on most filesystems
+            f.truncate(data_offset + RECORD.itemsize * capacity * len(channels))
+
+        self.counters = np.memmap(path, dtype="<i8", mode="r+", offset=counters_offset,
+                                  shape=(len(channels),))
+        self.records = np.memmap(path, dtype=RECORD, mode="r+", offset=data_offset,
+                                 shape=(len(channels), capacity))
+
+        # Channels sharing a decimation factor are reduced together; each group
+        # carries the samples of its unfinished window between appends
+        self.groups = []
+        for factor in sorted(set(decimate)):
+            cols = np.array([c for c, d in enumerate(decimate) if d == factor])
+            self.groups.append({"factor": factor, "cols": cols,
+                                "times": np.empty(0, dtype=np.int64),
+                                "tags": np.empty(0, dtype=np.int32),
+                                "values": np.empty((0, len(cols)), dtype=np.float32)})
+
+    def append(self, times, tags, values):
+        # times: int64 ms, tags: int32, values: (samples, channels)
+        for g in self.groups:
+            t = np.concatenate([g["times"], times])
+            s = np.concatenate([g["tags"], tags])
+            v = np.concatenate([g["values"], values[:, g["cols"]]])
+            factor = g["factor"]
+            n = len(t) // factor * factor
+            g["times"], g["tags"], g["values"] = t[n:], s[n:], v[n:]
+            if not n:
+                continue
+            if factor > 1:
+                t, s = t[factor - 1:n:factor], s[factor - 1:n:factor]
+                v = v[:n].reshape(-1, factor, v.shape[1]).mean(axis=1)
+            self._write(g["cols"], t, s, v)
+
+    def _write(self, cols, t, s, v):
+        # Records that would be overwritten within this same write are skipped
+        skipped = max(0, len(t) - self.capacity)
+        if skipped:
+            t, s, v = t[skipped:], s[skipped:], v[skipped:]
+        # Channels in a group always receive the same writes, so they share
+        # one counter value and one set of ring positions
+        start = int(self.counters[cols[0]]) + skipped
+        rows, idx = np.ix_(cols, (start + np.arange(len(t))) % self.capacity)
+        self.records["t"][rows, idx] = t
+        self.records["step"][rows, idx] = s
+        self.records["value"][rows, idx] = v.T
+        self.counters[cols] = start + len(t)
+
+    def flush(self):
+        self.records.flush()
+        self.counters.flush()
+
+    def close(self):
+        self.flush()
+        del self.records, self.counters
+
+def read_ring(path):
+    # Returns (header, {channel: records in time order}) from a ring file
+    with open(path, "rb") as f:
+        if f.read(8) != MAGIC:
+            raise ValueError(f"{path}: not a telemetry ring file")
+        length = int(np.frombuffer(f.read(8), dtype="<i8")[0])
+        header = json.loads(f.read(length))
+    channels, capacity = header["channels"], header["capacity"]
+    counters_offset, data_offset = _offsets(length, len(channels))
+    counters = np.memmap(path, dtype="<i8", mode="r", offset=counters_offset, shape=(len(channels),))
+    records = np.memmap(path, dtype=RECORD, mode="r", offset=data_offset,
+                        shape=(len(channels), capacity))
+    result = {}
+    for c, name in enumerate(channels):
+        count = int(counters[c])
+        n = min(count, capacity)
+        idx = (count - n + np.arange(n)) % capacity
+        result[name] = np.array(records[c][idx])
+    return header, result
+
+class TelemetryCapture:
+    # Captures every sheet of a LiveSource-style source (rings, samples, lock,
+    # wait_tick) into `directory`. decimate maps "<sheet>.<channel>" to a factor.
+    def __init__(self, source, directory, history_seconds=600, decimate=None):
+        self.source = source
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        decimate = decimate or {}
+
+        self.rings = []
+        for sheet in source.sheets:
+            channels = sheet["header"][1:]
+            factors = [decimate.get(f"{sheet['title']}.{name}", 1) for name in channels]
+            capacity = max(1, int(source.rate * history_seconds))
+            self.rings.append(RingFile(os.path.join(directory, f"{sheet['title']}.ring"),
+                                       sheet["title"], channels, capacity, factors))
+
+        # First sample index of steps not yet seen by the capture thread
+        # (appended by the executor), and the recent ones it still needs to tag
+        # samples with
+        self.step_lock = threading.Lock()
+        self.new_steps = []
+        self.step_starts = np.empty(0, dtype=np.int64)
+        self.step_tags = np.empty(0, dtype=np.int32)
+        self.steps_file = open(os.path.join(directory, "steps.jsonl"), "a", encoding="utf-8", buffering=1)
+
+        self.seen = source.samples
+        self.dropped = 0  # sample times lost before capture, not counted per sheet
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="tlm-capture", daemon=True)
+
+    def set_step(self, tag, label):
+        # Called by the executor as each step starts: samples released from
+        # here on belong to it
+        with self.source.lock:
+            first = self.source.samples
+        with self.step_lock:
+            self.new_steps.append((first, tag))
+        sheet = self.source.sheets[0]
+        t = time_axis(sheet["start"], np.array([first]), sheet["interval"])[0]
+        self.steps_file.write(json.dumps({"step": tag, "sample": first, "time": str(t),
+                                          "label": label}) + "\n")
+
+    def _tags_for(self, indices):
+        step_starts, step_tags = self.step_starts, self.step_tags
+        if not len(step_starts):
+            return np.zeros(len(indices), dtype=np.int32)
+        i = np.searchsorted(step_starts, indices, side="right") - 1
+        return np.where(i >= 0, step_tags[np.maximum(i, 0)], 0).astype(np.int32)
+
+    def _update_steps(self):
+        with self.step_lock:
+            new, self.new_steps = self.new_steps, []
+        if new:
+            starts, tags = zip(*new)
+            self.step_starts = np.append(self.step_starts, np.array(starts, dtype=np.int64))
+            self.step_tags = np.append(self.step_tags, np.array(tags, dtype=np.int32))
+
+    def _prune_steps(self, newest):
+        # Later samples can only fall in the step running at `newest` or after,
+        # so the list stays short however many steps a run has
+        keep = np.searchsorted(self.step_starts, newest, side="right") - 1
+        if keep > 0:
+            self.step_starts, self.step_tags = self.step_starts[keep:], self.step_tags[keep:]
+
+    def _collect(self):
+        # New samples of every sheet since the last call
+        with self.source.lock:
+            new = self.source.samples - self.seen
+            blocks = [ring.last(new) for ring in self.source.rings] if new > 0 else []
+            self.seen = self.source.samples
+        self._update_steps()
+        if blocks:
+            # The source only keeps its history window; anything older is lost.
+            # Sheets share one sample clock, so count lost samples once.
+            self.dropped += new - min(len(times) for times, _ in blocks)
+        for ring, (times, values) in zip(self.rings, blocks):
+            indices = np.arange(self.seen - len(times), self.seen)
+            times = times.astype("datetime64[ms]").astype(np.int64)
+            ring.append(times, self._tags_for(indices), values.astype(np.float32))
+        if blocks:
+            self._prune_steps(self.seen - 1)
+
+    def run(self):
+        seen = self.seen
+        while not self.stop_event.is_set():
+            seen = self.source.wait_tick(seen, timeout=0.5)
+            self._collect()
+        self._collect()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        for ring in self.rings:
+            ring.close()
+        self.steps_file.close()
@@ -0,0 +1,122 @@
+import json
+import math
+import os
+import time
+
+# ------------------------------------------------------------------------------
+# Execution tracing
+#
+# A Tracer collects timed spans (step, per-node send, loop iteration, whole run)
+# and feeds every duration into a latency histogram keyed by what was measured
+# ("command:arm", "node:Node1", "delay", "scheduler:lateness", ...). Recording
+# a span is a tuple append plus a histogram bucket increment; spans beyond
+# max_events are dropped (and counted) so a multi-day run can't grow memory
+# without bound, while the histograms keep counting.
+#
+# export_chrome_trace() writes the Trace Event Format ("X" complete events, one
+# track per executor / node) that chrome://tracing and Perfetto load directly.
+# ------------------------------------------------------------------------------
+MAX_EVENTS = 1_000_000
+BUCKETS_PER_OCTAVE = 8  # histogram resolution: ~9% relative error
+MIN_SECONDS = 1e-7      # durations below this share the lowest bucket
+
+class LatencyHistogram:
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        b = int(math.floor(math.log2(max(seconds, MIN_SECONDS)) * BUCKETS_PER_OCTAVE))
+        self.buckets[b] = self.buckets.get(b, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        # Upper edge of the bucket holding the p-th percentile, clamped to max
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= rank:
+                return min(2 ** ((b + 1) / BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class Tracer:
+    def __init__(self, clock=time.perf_counter, max_events=MAX_EVENTS):
+        self.clock = clock
+        self.max_events = max_events
+        self.origin = clock()
+        self.events = []
+        self.dropped = 0
+        self.histograms = {}
+
+    def now(self):
+        return self.clock()
+
+    def record(self, key, seconds):
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram()
+        hist.add(seconds)
+
+    def span(self, name, category, start, end, track="executor", args=None, key=None):
+        # One finished span; also recorded in histogram `key` if given
+        if len(self.events) < self.max_events:
+            self.events.append((name, category, start, end, track, args))
+        else:
+            self.dropped += 1
+        if key is not None:
+            self.record(key, end - start)
+
+    def summary(self):
+        lines = []
+        for key in sorted(self.histograms):
+            h = self.histograms[key]
+            lines.append(f"{key}: n={h.count} mean={h.mean() * 1000:.2f} ms "
+                         f"p50={h.percentile(50) * 1000:.2f} p95={h.percentile(95) * 1000:.2f} "
+                         f"p99={h.percentile(99) * 1000:.2f} max={h.max * 1000:.2f} ms")
+        if self.dropped:
+            lines.append(f"({self.dropped} spans not kept in the trace, limit {self.max_events})")
+        return lines
+
+    def chrome_trace(self):
+        tracks = {}
+        events = []
+        for name, category, start, end, track, args in self.events:
+            tid = tracks.get(track)
+            if tid is None:
+                tid = tracks[track] = len(tracks) + 1
+            event = {"name": name, "cat": category, "ph": "X", "pid": 1, "tid": tid,
+                     "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+            if args:
+                event["args"] = args
+            events.append(event)
+
+        meta = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "test suite"}}]
+        meta += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}}
+                 for track, tid in tracks.items()]
+        histograms = {key: {"count": h.count, "mean": h.mean(), "min": h.min, "max": h.max,
+                            "p50": h.percentile(50), "p95": h.percentile(95), "p99": h.percentile(99)}
+                      for key, h in self.histograms.items()}
+        return {"traceEvents": meta + events, "displayTimeUnit": "ms",
+                "otherData": {"histograms": histograms, "dropped_spans": self.dropped}}
+
+    def export_chrome_trace(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, separators=(",", ":"))
+        os.replace(tmp, path)
@@ -0,0 +1,451 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+from openpyxl import load_workbook
+
+# pyarrow is only needed to ingest Feather and Parquet tables
+try:
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    feather = pq = None
+
+# ------------------------------------------------------------------------------
+# Local time-series store
+#
+# ingest() reads generated sheets (an xlsx workbook, a csv file, or a directory
+# of csv/feather/parquet tables as written by telemetry_io) once and stores each
+# sheet as plain .npy arrays that are memory-mapped on query:
+#
+#   <store>/meta.json           sheets, their channels and rollup levels
+#   <store>/<sheet>/time.npy    int64 ms since epoch, ascending (the time index)
+#   <store>/<sheet>/<c>.npy     float64 values of channel c (column order)
+#   <store>/<sheet>/<c>.L<k>.npy   rollup level k: min, max, sum and count of
+#                               every FANOUT**k consecutive rows
+#
+# query() finds the row range by binary search on the time index, then takes
+# the coarsest rollup level that still has at least `points` buckets in range,
+# so it reads O(points) rollup records plus under two buckets of raw rows at
+# the ragged ends, however many rows the range covers. Those buckets are merged
+# down to at most `points` min/max/mean buckets, or fed to LTTB.
+# ------------------------------------------------------------------------------
+VERSION = 1
+FANOUT = 4            # rows per bucket grows by this factor at each level
+MIN_BUCKETS = 64      # no level coarser than this many buckets per sheet
+LTTB_OVERSAMPLE = 4   # rollup buckets per output point fed to LTTB
+READ_ROWS = 65536     # rows parsed per block while ingesting
+ROLLUP = np.dtype([("min", "<f8"), ("max", "<f8"), ("sum", "<f8"), ("count", "<i8")])
+TABLE_EXTS = (".csv", ".feather", ".parquet")
+TIME_FORMATS = ("%m/%d/%y %H:%M:%S", "%m/%d/%y %H:%M:%S.%f", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M")
+
+# ------------------------------------------------------------------------------
+# Readers
+#
+# Each yields (title, header, blocks) per sheet, where blocks yields
+# (times as datetime64[ms], [one float64 array per channel]).
+# ------------------------------------------------------------------------------
+def _to_float(values):
+    # Blank or non-numeric cells become NaN
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    out = np.empty(len(values))
+    for j, v in enumerate(values):
+        try:
+            out[j] = float(v)
+        except (TypeError, ValueError):
+            out[j] = np.nan
+    return out
+
+def _parse_time(value):
+    if isinstance(value, str):
+        for fmt in TIME_FORMATS:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                pass
+    return value
+
+def _to_times(values):
+    # ISO strings and datetimes convert directly; older workbooks store
+    # strings like "2/18/25 0:00:00", which are parsed one by one
+    try:
+        return np.array(values, dtype="datetime64[ms]")
+    except ValueError:
+        return np.array([_parse_time(v) for v in values], dtype="datetime64[ms]")
+
+def _block(rows, channels):
+    times = _to_times([r[0] for r in rows])
+    columns = [_to_float([r[c] if c < len(r) else None for r in rows]) for c in range(1, channels + 1)]
+    return times, columns
+
+def _row_blocks(rows, channels):
+    block = []
+    for row in rows:
+        if not row or row[0] in (None, ""):
+            continue
+        block.append(row)
+        if len(block) == READ_ROWS:
+            yield _block(block, channels)
+            block = []
+    if block:
+        yield _block(block, channels)
+
+def read_xlsx(path):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            header = [str(h) for h in next(rows, ()) if h is not None]
+            if len(header) > 1:
+                yield ws.title, header, _row_blocks(rows, len(header) - 1)
+    finally:
+        wb.close()
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = csv.reader(f)
+        header = next(rows, [])
+        title = os.path.splitext(os.path.basename(path))[0]
+        yield title, header, _row_blocks(rows, len(header) - 1)
+
+def _read_arrow(table):
+    header = table.column_names
+    for batch in table.to_batches(READ_ROWS):
+        times = batch.column(0).to_numpy().astype("datetime64[ms]")
+        yield times, [batch.column(c).to_numpy(zero_copy_only=False).astype(np.float64)
+                      for c in range(1, len(header))]
+
+def read_table(path):
+    title, ext = os.path.splitext(os.path.basename(path))
+    if ext == ".csv":
+        yield from read_csv(path)
+        return
+    if pq is None:
+        raise RuntimeError(f"{ext[1:]} input requires pyarrow (pip install pyarrow)")
+    table = feather.read_table(path) if ext == ".feather" else pq.read_table(path)
+    yield title, table.column_names, _read_arrow(table)
+
+def read_sheets(path):
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(TABLE_EXTS):
+                yield from read_table(os.path.join(path, name))
+    elif path.endswith(".xlsx"):
+        yield from read_xlsx(path)
+    elif path.endswith(TABLE_EXTS):
+        yield from read_table(path)
+    else:
+        raise ValueError(f"{path}: expected an .xlsx workbook, a table file or a directory of tables")
+
+# ------------------------------------------------------------------------------
+# Rollups
+# ------------------------------------------------------------------------------
+def _rollup(values, size):
+    # One ROLLUP record per `size` rows of raw values (NaNs ignored)
+    starts = np.arange(0, len(values), size)
+    finite = np.isfinite(values)
+    out = np.empty(len(starts), dtype=ROLLUP)
+    out["min"] = np.fmin.reduceat(values, starts)
+    out["max"] = np.fmax.reduceat(values, starts)
+    out["sum"] = np.add.reduceat(np.where(finite, values, 0.0), starts)
+    out["count"] = np.add.reduceat(finite.astype(np.int64), starts)
+    return out
+
+def _merge(records, starts):
+    # Merge runs of ROLLUP records beginning at `starts` into one record each
+    out = np.empty(len(starts), dtype=ROLLUP)
+    out["min"] = np.fmin.reduceat(records["min"], starts)
+    out["max"] = np.fmax.reduceat(records["max"], starts)
+    out["sum"] = np.add.reduceat(records["sum"], starts)
+    out["count"] = np.add.reduceat(records["count"], starts)
+    return out
+
+def rollup_levels(rows):
+    # Bucket sizes of the levels kept for a sheet of `rows` rows
+    sizes = []
+    size = FANOUT
+    while rows // size >= MIN_BUCKETS:
+        sizes.append(size)
+        size *= FANOUT
+    return sizes
+
+# ------------------------------------------------------------------------------
+# LTTB (largest triangle three buckets)
+# ------------------------------------------------------------------------------
+def lttb(x, y, points):
+    # Indices of `points` samples of (x, y) chosen by LTTB; keeps first and last
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1][:max(points, 0)], dtype=np.int64)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)  # points - 2 middle buckets
+
+    # Average point of every bucket, used as the third corner of the triangle
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:-1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:-1], edges[:-1]) / counts
+    avg_x = np.append(avg_x, x[-1])
+    avg_y = np.append(avg_y, y[-1])
+
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for b in range(points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - avg_x[b + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[b + 1] - ay))
+        a = lo + int(np.argmax(area))
+        chosen[b + 1] = a
+    return chosen
+
+# ------------------------------------------------------------------------------
+# Store
+# ------------------------------------------------------------------------------
+def _ms(value):
+    # datetime / ISO string / datetime64 -> int64 ms
+    return int(np.datetime64(value, "ms").astype(np.int64))
+
+class TimeSeriesStore:
+    def __init__(self, path):
+        self.path = path
+        self.meta = {"version": VERSION, "fanout": FANOUT, "sheets": {}}
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta.get("version") != VERSION:
+                raise ValueError(f"{path}: unsupported store version {self.meta.get('version')!r}")
+        self._arrays = {}  # memory-mapped arrays by file name
+
+    def _save_meta(self):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def _array(self, sheet, name):
+        key = (sheet, name)
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._arrays[key] = np.load(os.path.join(self.path, sheet, name), mmap_mode="r")
+        return array
+
+    def sheets(self):
+        return list(self.meta["sheets"])
+
+    def channels(self, sheet):
+        return self._sheet(sheet)["channels"]
+
+    def _sheet(self, sheet):
+        info = self.meta["sheets"].get(sheet)
+        if info is None:
+            raise KeyError(f"no sheet '{sheet}' in {self.path} (have {', '.join(self.meta['sheets']) or 'none'})")
+        return info
+
+    def ingest(self, source):
+        # Adds every sheet of `source`, replacing sheets with the same title.
+        # Returns {title: rows}.
+        os.makedirs(self.path, exist_ok=True)
+        ingested = {}
+        for title, header, blocks in read_sheets(source):
+            blocks = list(blocks)
+            if blocks:
+                times = np.concatenate([t for t, _ in blocks]).astype(np.int64)
+                columns = [np.concatenate([c[j] for _, c in blocks]) for j in range(len(header) - 1)]
+            else:
+                times = np.empty(0, dtype=np.int64)
+                columns = [np.empty(0) for _ in header[1:]]
+            del blocks
+            # Generated sheets are already in order; anything else is sorted once here
+            if len(times) and (np.diff(times) < 0).any():
+                order = np.argsort(times, kind="stable")
+                times, columns = times[order], [c[order] for c in columns]
+
+            directory = os.path.join(self.path, title)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            np.save(os.path.join(directory, "time.npy"), times)
+            levels = rollup_levels(len(times))
+            for c, values in enumerate(columns):
+                np.save(os.path.join(directory, f"{c}.npy"), values)
+                # Each level is built from the one below it
+                records = None
+                for k, size in enumerate(levels, start=1):
+                    if records is None:
+                        records = _rollup(values, size)
+                    else:
+                        records = _merge(records, np.arange(0, len(records), FANOUT))
+                    np.save(os.path.join(directory, f"{c}.L{k}.npy"), records)
+
+            self.meta["sheets"][title] = {"channels": header[1:], "rows": len(times), "levels": levels,
+                                          "source": os.path.abspath(source)}
+            self._arrays = {key: a for key, a in self._arrays.items() if key[0] != title}
+            ingested[title] = len(times)
+        self._save_meta()
+        return ingested
+
+    def time_range(self, sheet):
+        times = self._array(sheet, "time.npy")
+        if not len(times):
+            return None
+        return times[0].astype("datetime64[ms]"), times[-1].astype("datetime64[ms]")
+
+    def _rows(self, sheet, start, end, last):
+        # Row range [i0, i1) with start <= time <= end. `last` is seconds back
+        # from `end` (default the sheet's final sample).
+        times = self._array(sheet, "time.npy")
+        if not len(times):
+            return 0, 0
+        end_ms = _ms(end) if end is not None else int(times[-1])
+        start_ms = end_ms - int(last * 1000) if last is not None else (_ms(start) if start is not None else None)
+        i0 = int(np.searchsorted(times, start_ms, side="left")) if start_ms is not None else 0
+        i1 = int(np.searchsorted(times, end_ms, side="right"))
+        return i0, max(i0, i1)
+
+    def _buckets(self, sheet, c, i0, i1, target):
+        # (first row, ROLLUP record) of at least `target` buckets covering
+        # rows [i0, i1), from the coarsest level that has enough of them
+        info = self._sheet(sheet)
+        size, level = 1, 0
+        for k, s in enumerate(info["levels"], start=1):
+            if (i1 - i0) // s >= target:
+                size, level = s, k
+        values = self._array(sheet, f"{c}.npy")
+        if level == 0:
+            rows = np.arange(i0, i1)
+            return rows, _rollup(np.asarray(values[i0:i1]), 1)
+
+        # Whole buckets from the rollup, raw rows for the partial ones at the ends
+        b0, b1 = -(-i0 // size), i1 // size
+        parts, rows = [], []
+        if i0 < b0 * size:
+            parts.append(_rollup(np.asarray(values[i0:b0 * size]), b0 * size - i0))
+            rows.append([i0])
+        parts.append(np.asarray(self._array(sheet, f"{c}.L{level}.npy")[b0:b1]))
+        rows.append(np.arange(b0, b1) * size)
+        if b1 * size < i1:
+            parts.append(_rollup(np.asarray(values[b1 * size:i1]), i1 - b1 * size))
+            rows.append([b1 * size])
+        return np.concatenate(rows), np.concatenate(parts)
+
+    def query(self, sheet, channel, start=None, end=None, last=None, points=800, method="minmax"):
+        # Downsampled series of one channel between start and end (or the
+        # `last` seconds). method "minmax" returns up to `points` buckets with
+        # time (bucket start), min, max and mean; "lttb" returns up to `points`
+        # samples with time and value. Ranges with no more than `points` rows
+        # come back at full resolution (min = max = mean = value).
+        info = self._sheet(sheet)
+        if channel not in info["channels"]:
+            raise KeyError(f"no channel '{channel}' in sheet '{sheet}' (have {', '.join(info['channels'])})")
+        if method not in ("minmax", "lttb"):
+            raise ValueError(f"Unknown method '{method}' (expected minmax or lttb)")
+        c = info["channels"].index(channel)
+        times = self._array(sheet, "time.npy")
+        i0, i1 = self._rows(sheet, start, end, last)
+
+        if i1 - i0 <= points:
+            t = np.asarray(times[i0:i1]).astype("datetime64[ms]")
+            v = np.asarray(self._array(sheet, f"{c}.npy")[i0:i1])
+            if method == "lttb":
+                return {"time": t, "value": v}
+            return {"time": t, "min": v, "max": v, "mean": v}
+
+        if method == "lttb":
+            # LTTB over the bucket extremes, so short spikes stay candidates
+            rows, records = self._buckets(sheet, c, i0, i1, points * LTTB_OVERSAMPLE // 2)
+            t = np.repeat(times[rows], 2)
+            v = np.column_stack([records["min"], records["max"]]).ravel()
+            keep = np.isfinite(v)
+            t, v = t[keep], v[keep]
+            chosen = lttb(t, v, points)
+            return {"time": t[chosen].astype("datetime64[ms]"), "value": v[chosen]}
+
+        rows, records = self._buckets(sheet, c, i0, i1, points)
+        starts = np.unique(np.linspace(0, len(records), points, endpoint=False).astype(np.int64))
+        merged = _merge(records, starts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = merged["sum"] / merged["count"]
+        return {"time": np.asarray(times[rows[starts]]).astype("datetime64[ms]"),
+                "min": merged["min"], "max": merged["max"], "mean": mean}
+
+# ------------------------------------------------------------------------------
+# Command line
+# ------------------------------------------------------------------------------
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_duration(text):
+    # "90", "90s", "15m", "6h", "2d" -> seconds
+    text = text.strip().lower()
+    if text and text[-1] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest generated telemetry and run downsampled range queries.")
+    parser.add_argument("--store", default="telemetry.tsdb", help="store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="add sheets from xlsx/csv files or table directories")
+    ingest.add_argument("sources", nargs="+")
+
+    commands.add_parser("info", help="list sheets, channels and time ranges")
+
+    query = commands.add_parser("query", help="print a downsampled range of one channel")
+    query.add_argument("sheet")
+    query.add_argument("channel")
+    query.add_argument("--start", default=None, help="ISO timestamp (default: first sample)")
+    query.add_argument("--end", default=None, help="ISO timestamp (default: last sample)")
+    query.add_argument("--last", type=parse_duration, default=None,
+                       help="range length back from --end, e.g. 6h (overrides --start)")
+    query.add_argument("--points", type=int, default=800)
+    query.add_argument("--method", choices=["minmax", "lttb"], default="minmax")
+    query.add_argument("--json", action="store_true", help="print the result as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = TimeSeriesStore(args.store)
+
+    if args.command == "ingest":
+        for source in args.sources:
+            started = time.perf_counter()
+            ingested = store.ingest(source)
+            for title, rows in ingested.items():
+                print(f"{source}: {title} ({rows} rows)")
+            print(f"Ingested '{source}' in {time.perf_counter() - started:.2f} s")
+
+    elif args.command == "info":
+        for sheet in store.sheets():
+            info = store.meta["sheets"][sheet]
+            span = store.time_range(sheet)
+            span = f"{span[0]} .. {span[1]}" if span else "empty"
+            print(f"{sheet}: {info['rows']} rows, {span}, {len(info['levels'])} rollup levels")
+            print(f"  {', '.join(info['channels'])}")
+
+    else:
+        started = time.perf_counter()
+        result = store.query(args.sheet, args.channel, args.start, args.end, args.last, args.points, args.method)
+        elapsed = time.perf_counter() - started
+        if args.json:
+            print(json.dumps({key: (np.datetime_as_string(v).tolist() if key == "time" else
+                                    np.where(np.isfinite(v), v, None).tolist())
+                              for key, v in result.items()}))
+        else:
+            columns = [k for k in result if k != "time"]
+            print("time\t" + "\t".join(columns))
+            for row in zip(np.datetime_as_string(result["time"]).tolist(), *(result[k].tolist() for k in columns)):
+                print("\t".join(str(v) for v in row))
+            print(f"{len(result['time'])} points in {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()